@@ -1,21 +1,19 @@
-import cloudscraper
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import re
-import investgo as go
+import client
+from holdings import get_holdings
+from catalog import CATALOG
 
 def get_infos(id):
-    scraper = cloudscraper.create_scraper()
-    url = "https://aappapi.investing.com/get_screen.php"
     params = {
         "screen_ID": 22,
         "pair_ID": id,
         "lang_ID": "1",
         "include_pair_attr": "true",
     }
-    headers = {"x-meta-ver": "14"}
 
-    response = scraper.get(url, params=params, headers=headers)
+    response = client.get("get_screen.php", params)
     if response.status_code == 200:
         return response.json()
     else:
@@ -29,7 +27,7 @@ def extract_yield(eq_dividend_yield):
     return '-'
 
 def extract_data(json_data_list):
-    df_list = []
+    df_list, catalog_items = [], []
     for json_data in json_data_list:
         if json_data and "data" in json_data:
             data = json_data["data"]
@@ -45,7 +43,7 @@ def extract_data(json_data_list):
                         for pair in pairs_data:
                             # Fetch holdings data and check if it returns a valid list
                             try:   
-                                holdings = go.get_holdings(pair_id)
+                                holdings = get_holdings(pair_id)
                                 df_sectors = holdings[2]
                                 dominant_sector = df_sectors.loc[df_sectors['val'] > 40, 'fieldname']
                                 category = dominant_sector.iloc[0] if not dominant_sector.empty else "Global Equity"
@@ -61,6 +59,13 @@ def extract_data(json_data_list):
                                 }
                                 if pair_info["name"]:
                                     df_list.append(pair_info)
+                                    catalog_items.append({
+                                        "pair_ID": pair_id,
+                                        "search_main_longtext": pair_name,
+                                        "search_main_text": pair_symbol,
+                                        "pair_type": pair.get("pair_type_section"),
+                                    })
+    CATALOG.add(catalog_items)
     if df_list:
         df = pd.DataFrame(df_list)
         df.set_index('name', inplace=True)
@@ -76,16 +81,24 @@ def get_additional_fields(stock_ids):
     elif isinstance(stock_ids, str):
         stock_ids = [stock_ids]
 
-    results = {}
-    for stock_id in stock_ids:
-        try:
-            result = get_infos(stock_id)
+    results, failed_ids = {}, []
+    with ThreadPoolExecutor(max_workers=min(client.POOL_SIZE, len(stock_ids))) as executor:
+        futures = {executor.submit(get_infos, stock_id): stock_id for stock_id in stock_ids}
+        # Warm the holdings cache used by extract_data while the screen-22 requests run
+        for stock_id in stock_ids:
+            executor.submit(get_holdings, stock_id)
+
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as exc:
+                result = None
+            # Keep processing other stocks, failures are reported on the result
             if result:
-                results[stock_id] = result
-        except Exception as exc:
-            # Silently continue processing other stocks
-            continue
-    
+                results[futures[future]] = result
+            else:
+                failed_ids.append(futures[future])
+
     if not results:
         raise ValueError("No data fetched, check the stock IDs or API response")
 
@@ -97,4 +110,7 @@ def get_additional_fields(stock_ids):
     if df.empty:
         raise ValueError("Failed to convert data to DataFrame")
 
+    # IDs that still failed after the client's retries
+    df.attrs['failed_ids'] = [stock_id for stock_id in stock_ids if stock_id in failed_ids]
+
     return df
\ No newline at end of file
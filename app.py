@@ -1,21 +1,51 @@
 import streamlit as st
+import altair as alt
 import pandas as pd
 import numpy as np
 from streamlit_searchbox import st_searchbox
 from layout import apply_custom_css
 from search import fetch_search_results
 from holdings import process_and_combine_holdings
-from optimizations import optimize
-from metrics import calculate_metrics
+from optimizations import COVARIANCE, MODELS, RiskModel, efficient_frontier, frontier_points, optimization_key, optimize_cached, portfolio_point, random_portfolios
+from metrics import calculate_metrics, evaluate_portfolios, format_metrics, portfolio_paths, rolling_analytics
+from risk_stats import calculate_risk_statistics
+from simulation import fan_chart, shortfall_probabilities, simulate
+from backtest import FREQUENCIES, backtest_metrics, backtest_paths, walk_forward
 from additional_info import get_additional_fields
 from xray import create_pdf
-import investgo as go
+from price_store import get_dividends as get_stored_dividends, get_prices as get_stored_prices
+from cache import TTLCache, single_flight
+from overrides import apply_overlay, cleaning_rule, get_overlay, price_pair_id
+import client
 from datetime import datetime, timedelta
 import yfinance as yf
 from streamlit_pdf_viewer import pdf_viewer
 from streamlit_option_menu import option_menu
 import os
 import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Concurrent data fetching: bounded pool shared by all sessions, timeout per download (seconds)
+# counted from when the download starts, above the client's own retry budget so its retries can finish
+FETCH_MAX_WORKERS = 8
+FETCH_TIMEOUT = client.RETRY_BUDGET + 30
+FETCH_POOL = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix="fetch")
+
+# Default benchmark: MSCI World Index
+DEFAULT_BENCHMARK_ID = "38156"
+
+# Dividends per (ticker, start), persisted in the price store, and dividend-adjusted prices per (pair_ID, ticker, start, end)
+DIVIDEND_CACHE = TTLCache(ttl=86400, max_entries=1024)
+TOTAL_RETURN_CACHE = TTLCache(ttl=86400, max_entries=512)
+YF_DOWNLOAD_LOCK = threading.Lock()
+
+# Derived optimisation results (risk estimates, metrics, frontiers, backtests) per optimization_key of the prices
+RESULTS_CACHE = TTLCache(ttl=86400, max_entries=64)
+# Random allocations scored for the frontier chart, and how many of them are drawn
+RANDOM_PORTFOLIOS = 10000
+RANDOM_POINTS = 2000
 
 # Page configuration
 def set_page_config():
@@ -37,32 +67,60 @@ def process_isins(isin_list):
         for i, isin in enumerate(isin_list) if isin
     ]
 
-@st.cache_data(ttl=86400, show_spinner=False)
-def fetch_dividends(ticker):
-    try:
-        stock = yf.Ticker(ticker)
-        dividends = stock.dividends
-        if not dividends.empty:
-            dividends.index = dividends.index.tz_localize(None)
-            return dividends.sort_index()
-        return pd.Series()
-    except Exception as e:
-        st.error(f"Error fetching dividend data: {str(e)}")
-        return pd.Series()
+def download_dividends(tickers, start):
+    """Dividend histories for several tickers in one batched yfinance download"""
+    # yf.download keeps its results in module-level state, so downloads must not overlap
+    with YF_DOWNLOAD_LOCK:
+        data = yf.download(list(tickers), start=start, actions=True, progress=False, auto_adjust=False)
+    if data.empty or 'Dividends' not in data.columns.get_level_values(0):
+        return {ticker: pd.Series(dtype=float) for ticker in tickers}
+    dividends = data['Dividends']
+    if isinstance(dividends, pd.Series):
+        dividends = dividends.to_frame(name=tickers[0].upper())
+
+    results = {}
+    for ticker in tickers:
+        series = dividends.get(ticker.upper(), pd.Series(dtype=float)).dropna()
+        series = series[series != 0]
+        series.index = series.index.tz_localize(None)
+        results[ticker] = series.sort_index()
+    return results
+
+def fetch_dividends(tickers, start):
+    """Dividends per ticker since start ('%d%m%Y'), downloading only uncached tickers in one batch"""
+    start = datetime.strptime(start, '%d%m%Y').strftime('%Y-%m-%d')
+    missing = sorted({ticker for ticker in tickers if DIVIDEND_CACHE.get((ticker, start)) is None})
+    if missing:
+        try:
+            # Tickers already fetched today, by this or an earlier process, come from the price store
+            for ticker, dividends in get_stored_dividends(missing, start, download_dividends).items():
+                DIVIDEND_CACHE.set((ticker, start), dividends)
+        except Exception as e:
+            st.error(f"Error fetching dividend data: {str(e)}")
+    return {ticker: DIVIDEND_CACHE.get((ticker, start), pd.Series(dtype=float)) for ticker in tickers}
 
 def adjust_prices_for_dividends(df_stock, dividends):
     dividends.index = dividends.index.tz_localize(None)
     dividends = dividends.reindex(df_stock.index, fill_value=0)
     return df_stock.add(dividends.cumsum(), axis=0)
 
+def download_historical_prices(pair_id, start, end):
+    df_prices = client.get_historical_prices(pair_id, start, end)
+    if df_prices.empty:
+        return pd.Series(dtype=float, name='price')
+    df_stock = df_prices.price
+    df_stock.index = pd.to_datetime(df_stock.index, format='%d%m%Y')
+    return df_stock
+
 @st.cache_data(ttl=86400, show_spinner=False)
+@single_flight
 def fetch_historical_prices(pair_id, start, end):
-    df_stock = go.get_historical_prices(pair_id, start, end).price
-    df_stock.index = pd.to_datetime(df_stock.index, format='%d%m%Y')
+    # Served from the local price store, only days after the last stored date are downloaded
+    df_stock = get_stored_prices(pair_id, start, end, download_historical_prices)
     
-    # Special data cleaning for pair_ID 45429 (specific ETF with known data quality issues)
-    # Apply more aggressive outlier detection using multiple statistical methods
-    if pair_id == 45429:
+    # Instruments with known data quality issues get more aggressive outlier detection
+    # using multiple statistical methods (see overrides.SERIES_OVERRIDES)
+    if cleaning_rule(pair_id) == "aggressive":
         # Store original values for comparison
         original_values = df_stock.copy()
         
@@ -87,69 +145,72 @@ def fetch_historical_prices(pair_id, start, end):
     
     return df_stock_filtered
 
-def convert_daily_returns_to_prices(daily_returns_df, initial_price):
-    daily_returns_df['Date'] = pd.to_datetime(daily_returns_df['Date'])
-    daily_returns_df = daily_returns_df.set_index('Date')
-    daily_returns_df['Price'] = initial_price * (1 + daily_returns_df['Daily Return']).cumprod()
-    return daily_returns_df[['Price']]
+def fetch_pair_prices(pair_id, stock_name, start, end):
+    """Fetch the price history of one pair, applying its registered overrides"""
+    df_stock = fetch_historical_prices(price_pair_id(pair_id), start, end)
+    overlay = get_overlay(pair_id)
+    if overlay is not None:
+        df_stock = apply_overlay(df_stock, overlay, datetime.strptime(start, '%d%m%Y'), datetime.strptime(end, '%d%m%Y'))
+    return df_stock
+
+def submit_fetch(fn, *args):
+    """Submit a download to the shared fetch pool, keeping the Streamlit context for st.* calls"""
+    ctx = get_script_run_ctx()
+    started = threading.Event()
+
+    def run():
+        started.set()
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args)
+
+    future = FETCH_POOL.submit(run)
+    future.started = started
+    return future
+
+def fetch_result(future, description):
+    """Result of a submitted download; a timeout raises, so load_datas never caches a partial frame"""
+    # Time spent queued behind other sessions' downloads does not count against the timeout
+    future.started.wait()
+    try:
+        return future.result(timeout=FETCH_TIMEOUT)
+    except FuturesTimeoutError:
+        raise TimeoutError(f"Timed out fetching {description}") from None
 
 @st.cache_data(ttl=86400, show_spinner=False)
 def load_datas(selected_isins, additional_info_df, adjust_for_dividends=True):
     dfs, col_names = [], []
     start, end = (datetime.today() - timedelta(days=5*365)).strftime('%d%m%Y'), datetime.today().strftime('%d%m%Y')
+    selected_isins = [selected for selected in selected_isins if selected]
 
+    # Submit every price download and one batched dividend download up front so they run concurrently
+    price_futures, tickers = [], {}
     for selected in selected_isins:
-        if selected:
-            pair_id, stock_name = selected["pair_ID"], selected["search_main_longtext"]
-            
-            # Special handling for KMLM (pair_ID 1196641)
-            # This ETF requires combining scraped data with CSV historical returns
-            if pair_id == 1196641:  # KMLM
-                # Download data within the date range
-                df_stock = fetch_historical_prices(1196641, start, end)
-                df_stock = df_stock.to_frame(name=f'{stock_name}_scraped')
-                df_stock.index = pd.to_datetime(df_stock.index)
-                
-                # Get the initial price from the downloaded data
-                initial_price = df_stock.iloc[0, 0]
-                
-                # Load CSV data and convert daily returns to prices
-                # KMLM data file contains historical daily returns for this specific ETF
-                csv_path = os.path.join(os.path.dirname(__file__), "KMLM.csv")
-                daily_data = pd.read_csv(csv_path, parse_dates=['Date'])
-                daily_prices_df = convert_daily_returns_to_prices(daily_data, initial_price)
-                
-                # Merge Yahoo Finance data and CSV data
-                combined_df = pd.merge(df_stock, daily_prices_df, left_index=True, right_index=True, how='outer', suffixes=('_scraped', '_from_csv'))
-            
-                if f'{stock_name}_scraped' in combined_df.columns and 'Price' in combined_df.columns:
-                    combined_df.loc[:, f'{stock_name}_scraped'] = combined_df[f'{stock_name}_scraped'].fillna(combined_df['Price'])
-            
-                combined_df.drop(columns=['Price'], inplace=True)
-            
-                # Convert 'start' and 'end' back to datetime for comparison
-                start_dt = datetime.strptime(start, '%d%m%Y')
-                end_dt = datetime.strptime(end, '%d%m%Y')
-            
-                # Filter combined_df within the selected date range
-                combined_df = combined_df[(combined_df.index >= start_dt) & (combined_df.index <= end_dt)]
-                combined_df = combined_df.loc[~combined_df.index.duplicated(keep='first')]
-                df_stock = combined_df
-                
-            # TFLO (pair_ID 1191927) uses alternative data source (pair_ID 959362)
-            elif pair_id == 1191927:  # TFLO
-                df_stock = fetch_historical_prices(959362, start, end)
-            else:
-                df_stock = fetch_historical_prices(pair_id, start, end)
-
-            if adjust_for_dividends and stock_name in additional_info_df.index:
-                ticker = additional_info_df.loc[stock_name, "Symbol"]
-                dividends = fetch_dividends(ticker)
-                if not dividends.empty:
-                    df_stock = adjust_prices_for_dividends(df_stock, dividends)
-
-            dfs.append(df_stock)
-            col_names.append(stock_name)
+        pair_id, stock_name = selected["pair_ID"], selected["search_main_longtext"]
+        price_futures.append(submit_fetch(fetch_pair_prices, pair_id, stock_name, start, end))
+        if adjust_for_dividends and additional_info_df is not None and stock_name in additional_info_df.index:
+            tickers[stock_name] = additional_info_df.loc[stock_name, "Symbol"]
+    dividends_future = submit_fetch(fetch_dividends, list(tickers.values()), start) if tickers else None
+
+    dividends_by_ticker = {}
+    if dividends_future is not None:
+        dividends_by_ticker = fetch_result(dividends_future, "dividends")
+
+    # Collect results in the original column order
+    for selected, price_future in zip(selected_isins, price_futures):
+        pair_id, stock_name = selected["pair_ID"], selected["search_main_longtext"]
+        df_stock = fetch_result(price_future, f"prices for {stock_name}")
+
+        ticker = tickers.get(stock_name)
+        dividends = dividends_by_ticker.get(ticker)
+        if dividends is not None and not dividends.empty:
+            # Total-return series is computed once per instrument and data day, not per portfolio
+            df_stock = TOTAL_RETURN_CACHE.get_or_compute(
+                (pair_id, stock_name, ticker, start, end),
+                lambda: adjust_prices_for_dividends(df_stock, dividends.copy())
+            )
+
+        dfs.append(df_stock)
+        col_names.append(stock_name)
 
     if dfs:
         combined_df = pd.concat(dfs, axis=1)
@@ -157,8 +218,12 @@ def load_datas(selected_isins, additional_info_df, adjust_for_dividends=True):
         return combined_df.interpolate().ffill().bfill().dropna()
 
 @st.cache_data(ttl=86400, show_spinner=False)
+@single_flight
 def get_additional_fields_cached(pair_ids):
-    return get_additional_fields(pair_ids)
+    additional_info_df = get_additional_fields(pair_ids)
+    if additional_info_df is not None and additional_info_df.attrs.get('failed_ids'):
+        st.warning(f"Could not load details for pair IDs: {', '.join(map(str, additional_info_df.attrs['failed_ids']))}")
+    return additional_info_df
 
 # Display functions
 @st.fragment
@@ -166,6 +231,16 @@ def display_prices(combined_df):
     df_resampled = (1 + combined_df.pct_change()).cumprod().resample('W').mean()
     st.line_chart(df_resampled, height=650)
 
+@st.fragment
+def display_rolling(combined_df, benchmark=None):
+    analytics = rolling_analytics(combined_df, benchmark)
+    charts = [('Volatility', 'Rolling Volatility (%)'), ('Sharpe', 'Rolling Sharpe'),
+              ('Beta', 'Rolling Beta vs MSCI World'), ('Drawdown', 'Drawdown (%)')]
+    for name, title in charts:
+        if name in analytics:
+            st.caption(title)
+            st.line_chart(analytics[name].resample('W').last().dropna(how='all'), height=300)
+
 @st.fragment
 def display_correlation(combined_df):
     correlation_df = combined_df.pct_change().corr(method='spearman')
@@ -173,6 +248,14 @@ def display_correlation(combined_df):
     sorted_pairs = correlation_df.where(mask).unstack().dropna().sort_values(ascending=False).head(5)
     st.dataframe(sorted_pairs)
 
+def load_default_benchmark():
+    """Prices of DEFAULT_BENCHMARK_ID, None if they cannot be loaded"""
+    try:
+        benchmark_data = [{"pair_ID": DEFAULT_BENCHMARK_ID, "search_main_longtext": "Benchmark"}]
+        return load_datas(benchmark_data, get_additional_fields_cached([DEFAULT_BENCHMARK_ID]))['Benchmark']
+    except Exception:
+        return None
+
 # Load data and display
 @st.fragment
 def load_data_and_display(selected_isins):
@@ -180,15 +263,20 @@ def load_data_and_display(selected_isins):
     combined_df = load_datas(selected_isins, additional_info_df)
     
     if combined_df is not None:
-        metrics_df = calculate_metrics(combined_df)
+        metrics_df = pd.concat([calculate_metrics(combined_df), calculate_risk_statistics(combined_df)], axis=1)
         combined_metrics_df = pd.concat([additional_info_df, metrics_df], axis=1)
         st.subheader("Metrics", anchor=False)
-        st.dataframe(combined_metrics_df, use_container_width=True)
+        st.dataframe(combined_metrics_df.style.format(precision=2, na_rep="N/A"), use_container_width=True)
         st.subheader("Historical Prices", anchor=False)
         display_prices(combined_df)
         st.subheader("Correlations", anchor=False)
         display_correlation(combined_df)
 
+        # Rolling beta is left out when the benchmark cannot be loaded
+        benchmark = load_default_benchmark()
+        st.subheader("Rolling Risk (1 Year)", anchor=False)
+        display_rolling(combined_df, benchmark)
+
 # Optimize and display
 @st.fragment
 def optimize_and_display(selected_isins, weight_list):
@@ -196,29 +284,112 @@ def optimize_and_display(selected_isins, weight_list):
         [isin["pair_ID"] for isin in selected_isins if isin]
     )
     df_stocks = load_datas(selected_isins, additional_info_df)
-    weights_df = optimize(df_stocks)
 
+    # Models run in parallel; progress updates as each one finishes
+    progress = st.progress(0.0, text="Optimising...")
+    done = []
+    def report(label, error):
+        done.append(label)
+        progress.progress(len(done) / len(MODELS), text=f"Optimising... {label} done ({len(done)}/{len(MODELS)})")
+    # The 'benchmark' factor model takes its market factor from the default benchmark
+    benchmark = load_default_benchmark() if COVARIANCE == 'benchmark' else None
+    key = optimization_key(df_stocks, benchmark)
+    # Kept per key as well, so the estimates (frontier inputs included) survive manual-weight edits
+    risk = RESULTS_CACHE.get_or_compute((key, 'risk'), lambda: RiskModel(df_stocks, benchmark))
+    # Memoized per price matrix and configuration: reruns with the same prices skip the solvers
+    weights_df, errors = optimize_cached(df_stocks, on_result=report, risk=risk, key=key)
+    progress.empty()
+    for label, error in errors.items():
+        st.warning(f"{label} skipped: {error}")
+
+    returns = df_stocks.pct_change()
+    def portfolio_metrics(weights):
+        return pd.concat([
+            calculate_metrics(df_stocks, returns, weights),
+            calculate_risk_statistics(df_stocks, returns, weights),
+        ], axis=1)
+
+    # Model metrics are reused across reruns; only the manual column is evaluated each time
+    metrics_df = RESULTS_CACHE.get_or_compute((key, 'metrics', tuple(weights_df.columns)), lambda: portfolio_metrics(weights_df))
     if any(weight_list):
         manual_weights = [float(item)/100 for item in weight_list if item]
         weights_df['Manual'] = manual_weights
-
-    returns = df_stocks.pct_change()
-    metrics_df = calculate_metrics(df_stocks, returns, weights_df)
+        metrics_df = pd.concat([metrics_df, portfolio_metrics(weights_df[['Manual']])])
 
     st.subheader("Portfolio Weights (%)", anchor=False)
     st.dataframe((weights_df * 100).style.format("{:.2f}"), use_container_width=True)
 
     st.subheader("Performance Metrics", anchor=False)
-    st.dataframe(metrics_df.T, use_container_width=True)
+    st.dataframe(metrics_df.T.style.format(precision=2, na_rep="N/A"), use_container_width=True)
 
     st.subheader("Cumulative Returns Comparison", anchor=False)
-    plot_optimize = pd.concat(
-        [(1 + returns.dot(weights_df[col])).cumprod() for col in weights_df.columns],
-        axis=1
-    )
-    plot_optimize.columns = weights_df.columns
+    plot_optimize = portfolio_paths(returns, weights_df)
     st.line_chart(plot_optimize.resample('W').last(), height=650)
 
+    st.subheader("Efficient Frontier", anchor=False)
+    display_frontier(risk, key, weights_df.get('Manual'))
+
+    st.subheader("Walk-Forward Backtest", anchor=False)
+    if st.checkbox("Run out-of-sample backtest", key="run_backtest"):
+        display_backtest(df_stocks, key, benchmark)
+
+def display_backtest(df_stocks, key, benchmark=None):
+    """Out-of-sample paths and metrics of every optimizer, refitted at each rebalance"""
+    col1, col2, col3 = st.columns(3)
+    window_type = col1.selectbox("Estimation window", ["Rolling (1 year)", "Expanding"], key="backtest_window")
+    frequency = col2.selectbox("Rebalancing", list(FREQUENCIES), format_func=str.capitalize, key="backtest_frequency")
+    cost_bp = col3.number_input("Cost per turnover (bp)", min_value=0.0, value=10.0, step=5.0, key="backtest_cost")
+
+    with st.spinner("Backtesting..."):
+        result = RESULTS_CACHE.get_or_compute(
+            (key, 'backtest', window_type, frequency, cost_bp),
+            lambda: walk_forward(df_stocks, expanding=window_type == "Expanding", frequency=frequency, cost=cost_bp / 10000, benchmark=benchmark)
+        )
+    for label, count in result['failures'].items():
+        if count:
+            st.warning(f"{label} could not be fitted on {count} windows; previous weights were kept.")
+
+    st.dataframe(backtest_metrics(result).T.style.format(precision=2, na_rep="N/A"), use_container_width=True)
+    st.line_chart(backtest_paths(result).resample('W').last(), height=500)
+
+def random_cloud(risk):
+    """Ledoit-Wolf volatility and expected return (%) and historical Sharpe of RANDOM_PORTFOLIOS random allocations"""
+    weights = random_portfolios(risk.df, RANDOM_PORTFOLIOS, seed=0)
+    cloud = frontier_points(weights.to_numpy().T, risk.mu, risk.sigma)
+    cloud['Sharpe'] = evaluate_portfolios(risk.returns, weights)['Sharpe'].to_numpy()
+    return cloud
+
+def display_frontier(risk, key, manual_weights=None):
+    """Ledoit-Wolf and exponentially weighted frontiers over a cloud of random allocations, with the manual portfolio on each"""
+    cloud = RESULTS_CACHE.get_or_compute((key, 'random'), lambda: random_cloud(risk))
+    curves, points = [], []
+    for name, exponential in (("Ledoit-Wolf", False), ("Exponentially Weighted", True)):
+        curve = RESULTS_CACHE.get_or_compute((key, 'frontier', exponential), lambda: efficient_frontier(risk, exponential=exponential))
+        curves.append(curve.assign(Curve=name))
+        if manual_weights is not None:
+            points.append(portfolio_point(risk, manual_weights, exponential).to_frame().T.assign(Curve=f"Manual ({name})"))
+
+    axes = dict(
+        x=alt.X('Volatility', title='Volatility (%)', scale=alt.Scale(zero=False)),
+        y=alt.Y('Return', title='Expected Return (%)', scale=alt.Scale(zero=False)),
+        color='Curve',
+        tooltip=['Curve', alt.Tooltip('Volatility', format='.2f'), alt.Tooltip('Return', format='.2f')],
+    )
+    chart = alt.Chart(cloud.sample(min(RANDOM_POINTS, len(cloud)), random_state=0)).mark_circle(size=12, opacity=0.3, color='gray').encode(
+        x=axes['x'], y=axes['y'],
+        tooltip=[alt.Tooltip('Volatility', format='.2f'), alt.Tooltip('Return', format='.2f'), alt.Tooltip('Sharpe', format='.2f')],
+    )
+    chart += alt.Chart(pd.concat(curves)).mark_line(point=True).encode(**axes)
+    if points:
+        chart += alt.Chart(pd.concat(points)).mark_point(size=150, filled=True, shape='diamond').encode(**axes)
+    st.altair_chart(chart.properties(height=500), use_container_width=True)
+
+    if manual_weights is not None:
+        manual_sharpe = evaluate_portfolios(risk.returns, manual_weights.to_frame())['Sharpe'].iloc[0]
+        share = (cloud['Sharpe'] > manual_sharpe).mean() * 100
+        st.caption(f"Grey: {RANDOM_POINTS:,} of {len(cloud):,} random long-only allocations. "
+                   f"{share:.1f}% of them had a higher historical Sharpe ratio than Manual ({manual_sharpe:.2f}).")
+
 
 # Generate X-Ray report
 @st.fragment
@@ -275,9 +446,8 @@ def generate_xray_report(selected_isins, investment_strategy, weight_list, sri_v
         portfolio_metrics.columns = [""] + portfolio_metrics.columns[1:].tolist()
         portfolio_metrics['Yield'] = "{:.2f}%".format(weighted_dividends)
 
-        # Default benchmark: MSCI World Index (pair_ID 38156)
         if benchmark_id is None:
-            benchmark_id = "38156"
+            benchmark_id = DEFAULT_BENCHMARK_ID
 
         benchmark_data = [{"pair_ID": benchmark_id, "search_main_longtext": "Benchmark"}]
         additional_info_bench = get_additional_fields_cached([benchmark_id])
@@ -326,7 +496,26 @@ def generate_xray_report(selected_isins, investment_strategy, weight_list, sri_v
 
         # Generate PDF in project root directory
         pdf_path = os.path.join(os.path.dirname(__file__), "portfolio_report.pdf")
-        create_pdf(combined_metrics_df, combined_portfolio, portfolio_metrics, investment_strategy, sri_value, combined_bench, additional_data, benchmark)
+        rolling = rolling_analytics(pd.concat([combined_portfolio.rename('Portfolio'), benchmark.rename('Benchmark')], axis=1).dropna(), benchmark)
+        weekly = {name: frame.resample('W').last().dropna() for name, frame in rolling.items()}
+        rolling_data = {
+            'Rolling Volatility (1 Year)': (weekly['Volatility']['Portfolio'], weekly['Volatility']['Benchmark'], "{:.0f}%"),
+            'Rolling Sharpe Ratio (1 Year)': (weekly['Sharpe']['Portfolio'], weekly['Sharpe']['Benchmark'], "{:.1f}"),
+            'Rolling Beta vs Benchmark (1 Year)': (weekly['Beta']['Portfolio'], None, "{:.2f}"),
+            'Drawdown': (weekly['Drawdown']['Portfolio'], weekly['Drawdown']['Benchmark'], "{:.0f}%"),
+        }
+        # Windows longer than the available history produce no points
+        rolling_data = {section: series for section, series in rolling_data.items() if not series[0].empty}
+
+        # Projection: block bootstrap of the portfolio's daily returns, fixed seed so the report is reproducible
+        growth = simulate(combined_df.pct_change().iloc[1:], weights)
+        fan, shortfall = fan_chart(growth), shortfall_probabilities(growth)
+        st.subheader("Projected Value (%, 5 Years)", anchor=False)
+        st.line_chart(fan.set_index(fan.index / 252), height=400)
+        st.dataframe(shortfall.style.format("{:.1f}%"), use_container_width=True)
+        description = (f"{len(growth):,} simulated paths built from 1-month blocks of the portfolio's historical daily returns. "
+                       "Probabilities are the share of paths with a return below each level after each year.")
+        create_pdf(format_metrics(combined_metrics_df), combined_portfolio, format_metrics(portfolio_metrics), investment_strategy, sri_value, combined_bench, additional_data, benchmark, rolling_data, (fan, shortfall, description))
         st.download_button(label="Download X-Ray PDF", data=open(pdf_path, "rb"), file_name="portfolio_report.pdf")
         pdf_viewer(pdf_path)
 
@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+from pypfopt.risk_models import fix_nonpositive_semidefinite
+from optimizations import COV_SPAN, EMA_SPAN, MODELS, RiskModel
+from metrics import calculate_metrics
+from risk_stats import calculate_risk_statistics
+
+# Walk-forward defaults: one-year estimation window, monthly or quarterly rebalancing
+WINDOW = 252
+FREQUENCIES = {'monthly': 'M', 'quarterly': 'Q'}
+TRADING_DAYS = 252
+
+class WindowMoments:
+    """
+    Running sums of daily return rows inside a window that grows at the end and
+    optionally drops rows at the start.
+
+    Holds plain sums for the historical mean, Ledoit-Wolf covariance and shrinkage
+    intensity, plus exponentially decayed sums for the EMA return and exponential
+    covariance. Moving the window costs O(k n^2) for k added or dropped rows, instead
+    of re-estimating from the full window. risk_model() returns an
+    optimizations.RiskModel with every estimate filled in, matching what RiskModel
+    computes from the window's prices.
+    """
+
+    def __init__(self, returns):
+        self.returns = np.nan_to_num(np.asarray(returns, dtype=float))
+        n_assets = self.returns.shape[1]
+        self.start = self.end = 0
+        self.log_growth = np.zeros(n_assets)
+        self.s1 = np.zeros(n_assets)
+        self.s2 = np.zeros((n_assets, n_assets))
+        # Sums of q_t^2 and q_t * x_t with q_t = |x_t|^2, for the Ledoit-Wolf shrinkage
+        self.q2 = 0.0
+        self.qx = np.zeros(n_assets)
+        self.ema = {EMA_SPAN: self.empty_ew(n_assets), COV_SPAN: self.empty_ew(n_assets)}
+
+    @staticmethod
+    def empty_ew(n_assets):
+        return {'w': 0.0, 'x': np.zeros(n_assets), 'xx': np.zeros((n_assets, n_assets))}
+
+    def accumulate(self, rows, sign):
+        x = self.returns[rows]
+        q = np.einsum('ij,ij->i', x, x)
+        self.log_growth += sign * np.log1p(x).sum(axis=0)
+        self.s1 += sign * x.sum(axis=0)
+        self.s2 += sign * x.T @ x
+        self.q2 += sign * (q @ q)
+        self.qx += sign * q @ x
+
+    def accumulate_ew(self, rows, sign):
+        # Row t weighs decay^(end - 1 - t), as pandas ewm(adjust=True) does at the window's last row
+        x = self.returns[rows]
+        for span, sums in self.ema.items():
+            decay = 1 - 2 / (span + 1)
+            weights = decay ** (self.end - 1 - np.arange(rows.start, rows.stop))
+            sums['w'] += sign * weights.sum()
+            sums['x'] += sign * weights @ x
+            sums['xx'] += sign * (x * weights[:, None]).T @ x
+
+    def move(self, start, end):
+        """Cover return rows [start, end); both bounds only move forward"""
+        if end > self.end:
+            for span, sums in self.ema.items():
+                scale = (1 - 2 / (span + 1)) ** (end - self.end)
+                sums['w'] *= scale
+                sums['x'] *= scale
+                sums['xx'] *= scale
+            added = slice(self.end, end)
+            self.end = end
+            self.accumulate(added, 1)
+            self.accumulate_ew(added, 1)
+        if start > self.start:
+            dropped = slice(self.start, start)
+            self.accumulate(dropped, -1)
+            self.accumulate_ew(dropped, -1)
+            self.start = start
+
+    @property
+    def count(self):
+        return self.end - self.start
+
+    def ledoit_wolf(self):
+        """Daily Ledoit-Wolf covariance from the running sums (as sklearn.covariance.ledoit_wolf)"""
+        n, n_assets = self.count, len(self.s1)
+        mean = self.s1 / n
+        emp_cov = self.s2 / n - np.outer(mean, mean)
+        if n_assets == 1:
+            return emp_cov, 0.0
+
+        # sum_t |x_t - mean|^4 expanded in the running sums
+        c = mean @ mean
+        beta_sum = (self.q2 - 4 * self.qx @ mean + 4 * mean @ self.s2 @ mean
+                    + 2 * c * np.trace(self.s2) - 4 * c * mean @ self.s1 + n * c * c)
+        trace_mean = np.trace(emp_cov) / n_assets
+        delta_sum = np.sum(emp_cov ** 2)
+        beta = (beta_sum / n - delta_sum) / (n_assets * n)
+        delta = (delta_sum - 2 * trace_mean * np.trace(emp_cov) + n_assets * trace_mean ** 2) / n_assets
+        beta = min(beta, delta)
+        shrinkage = 0.0 if beta == 0 else beta / delta
+        shrunk = (1 - shrinkage) * emp_cov
+        shrunk.flat[::n_assets + 1] += shrinkage * trace_mean
+        return shrunk, shrinkage
+
+    def exp_cov(self):
+        """Daily exponential covariance around the window's plain mean (as pypfopt.risk_models.exp_cov)"""
+        sums = self.ema[COV_SPAN]
+        mean = self.s1 / self.count
+        weighted_mean = sums['x'] / sums['w']
+        return (sums['xx'] / sums['w'] - np.outer(weighted_mean, mean) - np.outer(mean, weighted_mean)
+                + np.outer(mean, mean))
+
+    def risk_model(self, prices_df, benchmark=None):
+        """RiskModel for the prices behind the current window, estimates taken from the running sums"""
+        assets = prices_df.columns
+        risk = RiskModel(prices_df, benchmark)
+        risk.mu = pd.Series(np.exp(self.log_growth * TRADING_DAYS / self.count) - 1, index=assets)
+        ema = self.ema[EMA_SPAN]
+        risk.mu_ema = pd.Series((1 + ema['x'] / ema['w']) ** TRADING_DAYS - 1, index=assets)
+        risk.returns = pd.DataFrame(self.returns[self.start:self.end], index=prices_df.index[1:], columns=assets)
+        # A factor COVARIANCE is estimated from the window's returns by RiskModel itself
+        if risk.factor is None:
+            sigma = pd.DataFrame(self.ledoit_wolf()[0] * TRADING_DAYS, index=assets, columns=assets)
+            risk.sigma = fix_nonpositive_semidefinite(sigma, fix_method='spectral')
+            sigma_ew = pd.DataFrame(self.exp_cov() * TRADING_DAYS, index=assets, columns=assets)
+            risk.sigma_ew = fix_nonpositive_semidefinite(sigma_ew, fix_method='spectral')
+        return risk
+
+def rebalance_positions(index, frequency='monthly', window=WINDOW):
+    """Positions of the first return row of each month or quarter with at least `window` rows before it"""
+    periods = index.to_period(FREQUENCIES[frequency])
+    starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+    return starts[starts >= window]
+
+def walk_forward(df_stocks, window=WINDOW, expanding=False, frequency='monthly', cost=0.0, models=None, benchmark=None):
+    """
+    Out-of-sample walk-forward backtest of the optimizers.
+
+    At the start of each month or quarter every model is refitted on the previous
+    `window` daily returns (or all of them when expanding) and held, drifting with
+    prices, until the next rebalance. Rebalancing costs `cost` per unit of turnover
+    (e.g. 0.001 for 10 bp); the first allocation is charged from cash. A model that
+    fails on a window keeps its previous weights (equal weights at the start).
+    benchmark (prices) is the market factor of the 'benchmark' COVARIANCE.
+
+    Returns:
+        dict: 'returns' (daily out-of-sample returns per model), 'weights' ({model:
+        target weights per rebalance date}), 'turnover' (per rebalance date and model)
+        and 'failures' ({model: number of windows it could not be fitted on})
+    """
+    models = models or list(MODELS)
+    prices = df_stocks.ffill()
+    returns_df = prices.pct_change().iloc[1:]
+    returns = np.nan_to_num(returns_df.to_numpy(dtype=float))
+    n_rows, n_assets = returns.shape
+    positions = rebalance_positions(returns_df.index, frequency, window)
+    if len(positions) == 0:
+        raise ValueError(f"Need more than {window} days of prices for a walk-forward backtest")
+
+    moments = WindowMoments(returns)
+    path = np.zeros((n_rows - positions[0], len(models)))
+    drifted = np.zeros((len(models), n_assets))
+    current = np.full((len(models), n_assets), 1 / n_assets)
+    weights = {label: [] for label in models}
+    turnover = np.zeros((len(positions), len(models)))
+    failures = dict.fromkeys(models, 0)
+
+    for k, position in enumerate(positions):
+        start = 0 if expanding else position - window
+        moments.move(start, position)
+        risk = moments.risk_model(prices.iloc[start:position + 1], benchmark)
+        for m, label in enumerate(models):
+            try:
+                fitted = MODELS[label](risk).iloc[:, 0].reindex(df_stocks.columns).fillna(0).to_numpy()
+                current[m] = fitted
+            except Exception:
+                failures[label] += 1
+            weights[label].append(current[m].copy())
+
+        # Hold the targets until the next rebalance; value of each holding relative to the rebalance
+        end = positions[k + 1] if k + 1 < len(positions) else n_rows
+        growth = np.cumprod(1 + returns[position:end], axis=0)
+        values = growth @ current.T
+        turnover[k] = np.abs(current - drifted).sum(axis=1)
+        values *= 1 - cost * turnover[k]
+        previous = np.vstack([np.ones(len(models)), values[:-1]])
+        path[position - positions[0]:end - positions[0]] = values / previous - 1
+        drifted = current * growth[-1] * (1 - cost * turnover[k])[:, None] / values[-1][:, None]
+
+    dates = returns_df.index[positions]
+    return {
+        'returns': pd.DataFrame(path, index=returns_df.index[positions[0]:], columns=models),
+        'weights': {label: pd.DataFrame(rows, index=dates, columns=df_stocks.columns) for label, rows in weights.items()},
+        'turnover': pd.DataFrame(turnover, index=dates, columns=models),
+        'failures': failures,
+    }
+
+def backtest_paths(result):
+    """Growth of 1 for each model's out-of-sample returns, starting the day before the first rebalance"""
+    returns = result['returns']
+    paths = (1 + returns).cumprod()
+    start = pd.DataFrame(1.0, index=[returns.index[0] - pd.Timedelta(days=1)], columns=returns.columns)
+    return pd.concat([start, paths])
+
+def backtest_metrics(result):
+    """Float performance and risk metrics of each model's out-of-sample path, plus average turnover per rebalance"""
+    paths = backtest_paths(result)
+    metrics_df = pd.concat([calculate_metrics(paths), calculate_risk_statistics(paths)], axis=1)
+    metrics_df['Turnover'] = result['turnover'].mean() * 100
+    return metrics_df
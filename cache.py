@@ -0,0 +1,121 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+class SingleFlight:
+    """
+    Process-wide request coalescing.
+
+    While a call for a key is running, identical calls wait on it and share its
+    result or exception instead of issuing their own. Nothing is kept afterwards.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._calls[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = fn()
+        except BaseException as exc:
+            with self._lock:
+                del self._calls[key]
+            future.set_exception(exc)
+            raise
+
+        with self._lock:
+            del self._calls[key]
+        future.set_result(value)
+        return value
+
+def freeze(value):
+    """Hashable form of call arguments (lists and dicts become tuples)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    return value
+
+SINGLE_FLIGHT = SingleFlight()
+
+def single_flight(fn):
+    """Coalesce concurrent identical calls to fn across threads and Streamlit sessions"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (fn.__module__, fn.__qualname__, freeze(args), freeze(kwargs))
+        try:
+            hash(key)
+        except TypeError:
+            return fn(*args, **kwargs)
+        return SINGLE_FLIGHT.do(key, lambda: fn(*args, **kwargs))
+    return wrapper
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with a time-to-live per entry.
+
+    Concurrent misses for the same key are de-duplicated: the first caller computes
+    the value, the others wait for it. Failures are raised to every waiter and not cached.
+    With max_entries set, the least recently used entry is evicted when full.
+    """
+
+    def __init__(self, ttl, max_entries=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key, default=None):
+        """Return a fresh cached value without computing it"""
+        with self._lock:
+            entry = self._lookup(key)
+        return entry[1] if entry is not None else default
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if self.max_entries is not None:
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            entry = self._lookup(key)
+        if entry is not None:
+            return entry[1]
+
+        def compute_and_store():
+            value = compute()
+            self.set(key, value)
+            return value
+
+        return self._flight.do(key, compute_and_store)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
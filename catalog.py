@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+
+# Instruments seen in search and screen-22 responses, kept across restarts
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), "data", "catalog.sqlite")
+FIELDS = ('pair_ID', 'search_main_longtext', 'search_main_subtext', 'search_main_text', 'pair_type')
+FUZZY_THRESHOLD = 0.6
+
+def trigrams(text):
+    text = f"  {text.lower()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class InstrumentCatalog:
+    """
+    Local instrument catalog with an in-memory trigram index.
+
+    Records use the search_by_type.php quote shape (pair_ID, search_main_longtext,
+    search_main_subtext, search_main_text for the symbol, pair_type) so catalog hits
+    can stand in for API results. The index is rebuilt from SQLite on load.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self.records = {}
+        self.index = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS instruments ("
+            "pair_ID INTEGER PRIMARY KEY, search_main_longtext TEXT, search_main_subtext TEXT, "
+            "search_main_text TEXT, pair_type TEXT)"
+        )
+        return conn
+
+    def load(self):
+        """Rebuild the in-memory index from disk"""
+        conn = self.connect()
+        try:
+            rows = conn.execute(f"SELECT {', '.join(FIELDS)} FROM instruments").fetchall()
+        finally:
+            conn.close()
+        with self._lock:
+            self.records.clear()
+            self.index.clear()
+            for row in rows:
+                self._index_record({field: value or '' for field, value in zip(FIELDS, row)})
+        return self
+
+    def _index_record(self, record):
+        # Caller holds the lock
+        pair_id = record['pair_ID']
+        old = self.records.get(pair_id)
+        if old is not None:
+            for gram in trigrams(self._text(old)):
+                self.index[gram].discard(pair_id)
+        self.records[pair_id] = record
+        for gram in trigrams(self._text(record)):
+            self.index[gram].add(pair_id)
+
+    @staticmethod
+    def _text(record):
+        return ' '.join(str(record.get(field) or '') for field in FIELDS[1:4])
+
+    def add(self, items):
+        """Insert or update instruments; missing fields keep their stored values"""
+        records = []
+        with self._lock:
+            for item in items:
+                if not item.get('pair_ID') or not item.get('search_main_longtext'):
+                    continue
+                pair_id = int(item['pair_ID'])
+                record = dict(self.records.get(pair_id, dict.fromkeys(FIELDS, '')))
+                record.update({field: item[field] for field in FIELDS[1:] if item.get(field)})
+                record['pair_ID'] = pair_id
+                if record == self.records.get(pair_id):
+                    continue
+                self._index_record(record)
+                records.append(record)
+        if not records:
+            return
+        conn = self.connect()
+        try:
+            with conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO instruments ({', '.join(FIELDS)}) VALUES (?, ?, ?, ?, ?)",
+                    [tuple(record[field] for field in FIELDS) for record in records]
+                )
+        finally:
+            conn.close()
+
+    def search(self, query, limit=20):
+        """
+        Return (matches, fuzzy): records containing query as a substring, and
+        records sharing at least FUZZY_THRESHOLD of its trigrams, best first.
+        """
+        query = query.strip().lower()
+        grams = trigrams(query)
+        scores = defaultdict(int)
+        with self._lock:
+            for gram in grams:
+                for pair_id in self.index.get(gram, ()):
+                    scores[pair_id] += 1
+            candidates = [(self.records[pair_id], count / len(grams)) for pair_id, count in scores.items()]
+
+        matches, fuzzy = [], []
+        for record, score in sorted(candidates, key=lambda c: (-c[1], c[0]['search_main_longtext'])):
+            if query in self._text(record).lower():
+                matches.append(record)
+            elif score >= FUZZY_THRESHOLD:
+                fuzzy.append(record)
+        return matches[:limit], fuzzy[:limit]
+
+CATALOG = InstrumentCatalog().load()
@@ -0,0 +1,187 @@
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import cloudscraper
+import pandas as pd
+from investgo.historical import generate_date_ranges, json_to_dataframe
+from investgo.holdings import parse_holdings_data
+
+# Shared access to the investing.com mobile API
+BASE_URL = "https://aappapi.investing.com"
+HEADERS = {"x-meta-ver": "14"}
+POOL_SIZE = 8
+
+# Rate limiting and retries
+RATE_PER_SECOND = 10
+BURST = 20
+MAX_CONCURRENCY = 16
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30
+REQUEST_TIMEOUT = 20
+# Longest a single get() can take: every attempt timing out plus every backoff at its cap
+RETRY_BUDGET = (MAX_RETRIES + 1) * REQUEST_TIMEOUT + MAX_RETRIES * BACKOFF_CAP
+
+class ScraperPool:
+    """
+    Pool of warm cloudscraper sessions.
+
+    Sessions are created lazily up to `size` and reused, so the Cloudflare challenge
+    and TLS handshake are paid once per session instead of once per request.
+    Each session is used by one thread at a time.
+    """
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self):
+        try:
+            scraper = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            scraper = cloudscraper.create_scraper() if create else self._idle.get()
+        try:
+            yield scraper
+        finally:
+            self._idle.put(scraper)
+
+class TokenBucket:
+    """Blocking token bucket: `rate` requests per second on average, bursts up to `capacity`"""
+
+    def __init__(self, rate=RATE_PER_SECOND, capacity=BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adjusted from observed errors (AIMD).
+
+    Each success raises the limit by 1/limit, so it grows by about one per round of
+    requests; each throttle or server error halves it, never below one.
+    """
+
+    def __init__(self, initial=POOL_SIZE, maximum=MAX_CONCURRENCY):
+        self.limit = float(initial)
+        self.maximum = maximum
+        self._active = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while self._active >= int(self.limit):
+                self._cond.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def on_error(self):
+        with self._cond:
+            self.limit = max(1.0, self.limit / 2)
+
+SCRAPER_POOL = ScraperPool()
+RATE_LIMITER = TokenBucket()
+CONCURRENCY = AdaptiveLimiter()
+
+def backoff_delay(attempt, response=None):
+    """Full-jitter exponential backoff, honouring Retry-After when the server sends it"""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(BACKOFF_CAP, int(retry_after))
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def is_retryable(status_code):
+    # Cloudflare answers an over-eager client with 403 rather than 429, so it is a throttle too
+    return status_code in (403, 429) or status_code >= 500
+
+def get(path, params):
+    """
+    GET an API endpoint (e.g. 'get_screen.php') through a pooled session.
+
+    Requests are rate limited and bounded by the adaptive concurrency limit.
+    403, 429, 5xx and connection errors halve the concurrency limit and are retried
+    with backoff; the last response is returned (or the last exception raised) once
+    retries are exhausted.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        RATE_LIMITER.acquire()
+        response, error = None, None
+        with CONCURRENCY.slot():
+            try:
+                with SCRAPER_POOL.session() as scraper:
+                    response = scraper.get(f"{BASE_URL}/{path}", params=params, headers=HEADERS, timeout=REQUEST_TIMEOUT)
+            except Exception as exc:
+                error = exc
+
+        if error is None and not is_retryable(response.status_code):
+            CONCURRENCY.on_success()
+            return response
+
+        CONCURRENCY.on_error()
+        if attempt == MAX_RETRIES:
+            if error is not None:
+                raise error
+            return response
+        time.sleep(backoff_delay(attempt, response))
+
+def get_json(path, params):
+    response = get(path, params)
+    response.raise_for_status()
+    return response.json()
+
+def get_historical_prices(pair_id, start, end):
+    """Same result as investgo.get_historical_prices, fetched through the shared client"""
+    def fetch_range(date_range):
+        params = {"screen_ID": 63, "pair_ID": pair_id, "lang_ID": 1, "date_from": date_range[0], "date_to": date_range[1]}
+        return json_to_dataframe(get_json("get_screen.php", params))
+
+    date_ranges = generate_date_ranges(start, end)
+    with ThreadPoolExecutor(max_workers=max(1, len(date_ranges))) as executor:
+        results = list(executor.map(fetch_range, date_ranges))
+
+    valid_results = [df for df in results if not df.empty]
+    if valid_results:
+        valid_results.sort(key=lambda df: df.index.min())
+        return pd.concat(valid_results)
+    return pd.DataFrame()
+
+def get_holdings(pair_id):
+    """Same result as investgo.get_holdings(pair_id), fetched through the shared client"""
+    if not pair_id:
+        raise ValueError("Missing required parameter: pair_id")
+    json_data = get_json("get_screen.php", {"screen_ID": 125, "pair_ID": pair_id, "lang_ID": 1})
+    return list(parse_holdings_data(json_data).values())
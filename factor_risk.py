@@ -0,0 +1,98 @@
+import cvxpy as cp
+import numpy as np
+import pandas as pd
+
+# Factor models: number of statistical factors, floor on specific (idiosyncratic) variance
+N_FACTORS = 5
+SPECIFIC_FLOOR = 1e-10
+
+class FactorCovariance:
+    """
+    Covariance kept as low rank plus diagonal: B F B' + diag(d).
+
+    B holds the (n x k) factor loadings, F the (k x k) factor covariance and d the
+    n specific variances. Products, variances and solver expressions cost O(n k)
+    instead of O(n^2). dense() builds the full matrix only for consumers that
+    need one (CLA, HRP, the efficient frontier).
+    """
+
+    def __init__(self, loadings, factor_cov, specific, assets):
+        self.loadings = np.asarray(loadings, dtype=float)
+        self.factor_cov = np.atleast_2d(np.asarray(factor_cov, dtype=float))
+        self.specific = np.asarray(specific, dtype=float)
+        self.assets = pd.Index(assets)
+
+    @property
+    def n_factors(self):
+        return self.factor_cov.shape[0]
+
+    def diag(self):
+        return np.einsum('ik,kl,il->i', self.loadings, self.factor_cov, self.loadings) + self.specific
+
+    def dot(self, x):
+        """Covariance times a vector (or the columns of a matrix)"""
+        x = np.asarray(x, dtype=float)
+        specific = self.specific if x.ndim == 1 else self.specific[:, None]
+        return self.loadings @ (self.factor_cov @ (self.loadings.T @ x)) + specific * x
+
+    def variance(self, weights):
+        weights = np.asarray(weights, dtype=float)
+        return float(weights @ self.dot(weights))
+
+    def cvxpy_variance(self, weights):
+        """Portfolio variance of a cvxpy variable as |G' w|^2 + sum(d w^2), with G G' = B F B'"""
+        exposure = self.loadings @ np.linalg.cholesky(self.factor_cov + 1e-18 * np.eye(self.n_factors))
+        return cp.sum_squares(exposure.T @ weights) + cp.sum(cp.multiply(self.specific, cp.square(weights)))
+
+    def dense(self):
+        matrix = self.loadings @ self.factor_cov @ self.loadings.T
+        matrix[np.diag_indices_from(matrix)] += self.specific
+        return pd.DataFrame(matrix, index=self.assets, columns=self.assets)
+
+def observation_weights(n_rows, span=None):
+    """Row weights for second moments: flat 1/(T-1) as in a sample covariance, or exponentially decaying"""
+    if span is None:
+        return np.full(n_rows, 1 / max(n_rows - 1, 1))
+    weights = (1 - 2 / (span + 1)) ** np.arange(n_rows - 1, -1, -1)
+    return weights / weights.sum()
+
+def centered_returns(returns_df, span=None):
+    returns = np.nan_to_num(returns_df.to_numpy(dtype=float))
+    weights = observation_weights(len(returns), span)
+    return returns - returns.mean(axis=0), weights
+
+def pca_factor_model(returns_df, n_factors=N_FACTORS, span=None, frequency=252):
+    """
+    Statistical factor covariance from the leading principal components of daily returns.
+
+    The components come from a thin SVD of the (weighted) return matrix, O(T n min(T, n)),
+    so the n x n sample covariance is never formed; whatever the factors do not explain
+    is kept as specific variance. With span set, observations are weighted exponentially
+    as in pypfopt.risk_models.exp_cov.
+    """
+    centered, weights = centered_returns(returns_df, span)
+    n_factors = max(1, min(n_factors, *centered.shape))
+    scaled = centered * np.sqrt(weights)[:, None]
+    _, singular, components = np.linalg.svd(scaled, full_matrices=False)
+    loadings = components[:n_factors].T
+    factor_cov = np.diag(singular[:n_factors] ** 2)
+    total = np.sum(scaled ** 2, axis=0)
+    specific = np.maximum(total - (loadings ** 2) @ np.diag(factor_cov), SPECIFIC_FLOOR)
+    return FactorCovariance(loadings, factor_cov * frequency, specific * frequency, returns_df.columns)
+
+def benchmark_factor_model(returns_df, benchmark_returns=None, span=None, frequency=252):
+    """
+    Single-index covariance: beta_i beta_j var(m) plus residual variance.
+
+    Without a benchmark the equal-weighted average of the assets stands in for the market.
+    """
+    if benchmark_returns is None:
+        benchmark_returns = returns_df.mean(axis=1)
+    market = np.nan_to_num(benchmark_returns.reindex(returns_df.index).to_numpy(dtype=float))
+    centered, weights = centered_returns(returns_df, span)
+    market = market - market.mean()
+    market_var = weights @ market ** 2
+    betas = (weights * market) @ centered / market_var
+    residual = centered - np.outer(market, betas)
+    specific = np.maximum(weights @ residual ** 2, SPECIFIC_FLOOR)
+    return FactorCovariance(betas[:, None], [[market_var * frequency]], specific * frequency, returns_df.columns)
@@ -1,45 +1,84 @@
+import numpy as np
 import pandas as pd
-import investgo as go
+import client
+from cache import TTLCache
+from overrides import holdings_pair_id, underlying_funds
+
+# Fund-of-funds expansion stops after this many nested levels
+MAX_LOOK_THROUGH_DEPTH = 3
+
+# Holdings change at most daily; every caller shares this cache, bounded as look-through reaches many funds
+HOLDINGS_CACHE = TTLCache(ttl=86400, max_entries=2048)
+
+def get_holdings(pair_id):
+    """Cached holdings lookup, at most one upstream call per pair per day"""
+    return HOLDINGS_CACHE.get_or_compute(int(pair_id), lambda: client.get_holdings(pair_id))
+
+def look_through(pair_id, weight, depth=0, path=()):
+    """
+    Yield (holdings_info, top holdings weight, breakdown weight) for a position of `weight` in a fund.
+
+    Underlying funds declared in the overrides are expanded recursively (up to
+    MAX_LOOK_THROUGH_DEPTH, skipping cycles): their share of the parent's top
+    holdings is replaced by their own holdings, and the parent's other breakdowns
+    are scaled to the share it holds directly.
+    """
+    pair_id = int(pair_id)
+    holdings_info = get_holdings(holdings_pair_id(pair_id))
+    if len(holdings_info) < 4:
+        return
+
+    underlying = underlying_funds(pair_id) if depth < MAX_LOOK_THROUGH_DEPTH else {}
+    if not underlying:
+        yield holdings_info, weight, weight
+        return
+
+    top = holdings_info[0]
+    nested = top[top.iloc[:, 0].isin(underlying.keys())]
+    nested = nested[~nested.iloc[:, 0].map(underlying).isin(path + (pair_id,))]
+    if nested.empty:
+        yield holdings_info, weight, weight
+        return
+
+    shares = nested.iloc[:, 1].astype(float) / 100
+    direct = [top.drop(nested.index)] + list(holdings_info[1:4])
+    yield direct, weight, weight * (1 - shares.sum())
+    for name, share in zip(nested.iloc[:, 0], shares):
+        yield from look_through(underlying[name], weight * share, depth + 1, path + (pair_id,))
+
+def aggregate(frames, weights):
+    """One grouped sum of weighted rows from every frame, columns named after the first frame"""
+    keys = np.concatenate([frame[frame.columns[0]].to_numpy(dtype=object) for frame in frames])
+    values = np.concatenate([frame[frame.columns[1]].to_numpy(dtype=float) * weight for frame, weight in zip(frames, weights)])
+    key_column, value_column = frames[0].columns[:2]
+    totals = pd.Series(values).groupby(keys).sum()
+    return pd.DataFrame({key_column: totals.index, value_column: totals.to_numpy().round(2)})
 
 def process_and_combine_holdings(selected_isins, weight_list):
+    """
+    Portfolio look-through: sectors and the four holdings breakdowns (top holdings,
+    asset allocation, sectors, countries) in % of the portfolio.
+
+    Weighted rows of every fund (and of nested funds) are collected first and each
+    breakdown is reduced with a single grouped sum. Returns (None, None) when no
+    fund has holdings data.
+    """
     valid_entries = [(selected, float(weight_list[i]) / 100 if weight_list[i].strip() else 1 / len(selected_isins)) for i, selected in enumerate(selected_isins) if selected]
-    
-    combined_sectors = None
-    combined_holdings = [None, None, None, None]
-    
+
+    frames, weights = [[] for _ in range(4)], [[] for _ in range(4)]
     for selected, weight in valid_entries:
-        pair_id = selected["pair_ID"]
-        #replace idsS
-        if pair_id == 1024340: #xlps
-            pair_id = 40690 #xlp
-        holdings_info = go.get_holdings(pair_id)
-        
-        if len(holdings_info) >= 4:
-            df_sectors = holdings_info[2].copy()
-            df_sectors.iloc[:, 1] = df_sectors.iloc[:, 1].astype(float) * weight
-            
-            if combined_sectors is None:
-                combined_sectors = df_sectors
-            else:
-                combined_sectors = pd.concat([combined_sectors, df_sectors], axis=0)
-                combined_sectors = combined_sectors.groupby(combined_sectors.columns[0]).sum().reset_index()
-            
+        for holdings_info, top_weight, breakdown_weight in look_through(selected["pair_ID"], weight):
             for i in range(4):
-                df_copy = holdings_info[i].copy()
-                df_copy.iloc[:, 1] = df_copy.iloc[:, 1].astype(float) * weight
-                if combined_holdings[i] is None:
-                    combined_holdings[i] = df_copy
-                else:
-                    combined_holdings[i] = pd.concat([combined_holdings[i], df_copy], axis=0)
-                    combined_holdings[i] = combined_holdings[i].groupby(combined_holdings[i].columns[0]).sum().reset_index()
-
-    combined_sectors.iloc[:, 1] = combined_sectors.iloc[:, 1].round(2)
-    for i in range(4):
-        combined_holdings[i].iloc[:, 1] = combined_holdings[i].iloc[:, 1].round(2)
-
-    combined_sectors = combined_sectors.sort_values(by=combined_sectors.columns[1], ascending=False)
+                frames[i].append(holdings_info[i])
+                weights[i].append(top_weight if i == 0 else breakdown_weight)
+
+    if not frames[0]:
+        return None, None
+
+    combined_holdings = [aggregate(frames[i], weights[i]) for i in range(4)]
+    combined_sectors = combined_holdings[2].sort_values(by=combined_holdings[2].columns[1], ascending=False)
     combined_holdings[0] = combined_holdings[0].sort_values(by=combined_holdings[0].columns[1], ascending=False).head(10)
     combined_holdings[1] = combined_holdings[1].sort_values(by=combined_holdings[1].columns[1], ascending=False)
     combined_holdings[3] = combined_holdings[3].sort_values(by=combined_holdings[3].columns[1], ascending=False)
-    
-    return combined_sectors, combined_holdings
\ No newline at end of file
+
+    return combined_sectors, combined_holdings
@@ -1,110 +1,214 @@
 import numpy as np
 import pandas as pd
+from collections import deque
 from datetime import datetime
 
-def calculate_cagr(start, end, periods):
-    """Calculate Compound Annual Growth Rate"""
-    try:
-        if start <= 0 or end <= 0 or periods <= 0:
-            return np.nan
-        return (end / start) ** (1 / periods) - 1
-    except (ZeroDivisionError, ValueError, OverflowError):
-        return np.nan
-
-def calculate_std_dev(returns):
-    return returns.std() * np.sqrt(252)
-
-def calculate_sharpe_ratio(returns, risk_free_rate=0):
-    """Calculate annualized Sharpe Ratio"""
-    excess_returns = returns - risk_free_rate
-    return (excess_returns.mean() / returns.std()) * np.sqrt(252) if returns.std() != 0 else 0
-
-def calculate_best_year(returns):
-    yearly_returns = returns.resample('Y').apply(lambda x: (1 + x).prod() - 1)
-    return yearly_returns.max()
-
-def calculate_worst_year(returns):
-    yearly_returns = returns.resample('Y').apply(lambda x: (1 + x).prod() - 1)
-    return yearly_returns.min()
-
-def calculate_ytd_return(prices):
-    """Calculate year-to-date return"""
-    current_year = prices.index[-1].year
-    year_start_price = prices[prices.index.year == current_year].iloc[0]
-    latest_price = prices.iloc[-1]
-    return (latest_price / year_start_price - 1) * 100
-
-def calculate_period_return(prices, months):
-    """Calculate return for a specific period in months"""
-    if len(prices) < 2:
-        return np.nan
-
-    end_date = prices.index[-1]
-    start_date = end_date - pd.DateOffset(months=months)
-
-    # Find the closest date on or after start_date
-    valid_dates = prices.loc[prices.index >= start_date]
-    if len(valid_dates) == 0:
-        return np.nan
-
-    start_price = valid_dates.iloc[0]
-    end_price = prices.iloc[-1]
-
-    total_return = (end_price / start_price - 1) * 100
-
-    # Annualize if period is 12 months or more
-    if months >= 12:
-        years = months / 12
-        return ((1 + total_return/100) ** (1/years) - 1) * 100
-    return total_return
+METRIC_COLUMNS = ['Sharpe', 'Vol.', '1m', '3m', 'YTD', '1yr', '3yr', '5yr']
+PERIOD_MONTHS = {'1m': 1, '3m': 3, '1yr': 12, '3yr': 36}
+MEMORY_BUDGET = 64 * 1024 ** 2
+ROLLING_WINDOW = 252
 
-def calculate_metrics(prices_df, returns_df=None, weights_df=None):
+def lookback_positions(index, months):
+    """Row position of the first date on or after `months` before the last date, len(index) if none"""
+    return index.searchsorted(index[-1] - pd.DateOffset(months=months), side='left')
+
+def compute_metrics_matrix(prices, returns, index):
+    """
+    Compute every metric for all columns at once.
+
+    Args:
+        prices (np.ndarray): (T x K) prices, NaN where a series has not started
+        returns (np.ndarray): (T' x K) periodic returns, NaN entries are ignored
+        index (pd.DatetimeIndex): dates of the price rows, sorted
+
+    Returns:
+        pd.DataFrame: float metrics, one row per column, in METRIC_COLUMNS order
+    """
+    n_rows, n_cols = prices.shape
     metrics = {}
-    
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        counts = np.sum(~np.isnan(returns), axis=0)
+        mean = np.nansum(returns, axis=0) / counts
+        std = np.sqrt(np.nansum((returns - mean) ** 2, axis=0) / (counts - 1))
+        std = np.where(counts > 1, std, np.nan)
+        metrics['Sharpe'] = np.where(std == 0, 0.0, mean / std * np.sqrt(252))
+        metrics['Vol.'] = std * np.sqrt(252) * 100
+
+        end_values = prices[-1]
+
+        def period_return(months):
+            pos = lookback_positions(index, months)
+            if n_rows < 2 or pos >= n_rows:
+                return np.full(n_cols, np.nan)
+            total_return = (end_values / prices[pos] - 1) * 100
+            # Annualize if period is 12 months or more
+            if months >= 12:
+                return ((1 + total_return / 100) ** (12 / months) - 1) * 100
+            return total_return
+
+        ytd_pos = index.searchsorted(pd.Timestamp(index[-1].year, 1, 1), side='left')
+        years = (index[-1] - index[0]).days / 365.25
+        start_values = prices[0]
+        valid = (years > 0) & (start_values > 0) & (end_values > 0)
+        cagr = np.where(valid, ((end_values / start_values) ** (1 / years if years > 0 else np.nan) - 1) * 100, np.nan)
+
+        for name, months in PERIOD_MONTHS.items():
+            metrics[name] = period_return(months)
+        metrics['YTD'] = (end_values / prices[ytd_pos] - 1) * 100
+        metrics['5yr'] = cagr
+
+    return metrics
+
+def compute_metrics(prices_df):
+    """Metrics for every column of a price frame, as floats (the screening entry point)"""
+    prices = prices_df.interpolate(method='linear').to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = prices[1:] / prices[:-1] - 1
+    metrics = compute_metrics_matrix(prices, returns, prices_df.index)
+    return pd.DataFrame(metrics, index=prices_df.columns, columns=METRIC_COLUMNS)
+
+def as_weight_matrix(returns_df, weights):
+    """(assets x K) float weights aligned to the columns of returns_df"""
+    if not isinstance(weights, pd.DataFrame):
+        weights = pd.DataFrame(np.asarray(weights, dtype=float).reshape(len(returns_df.columns), -1), index=returns_df.columns)
+    return weights.reindex(returns_df.columns).to_numpy(dtype=float), weights.columns
+
+def portfolio_paths(returns_df, weights):
+    """Cumulative growth of each weight column from one matrix product, as a date-indexed frame"""
+    returns = returns_df.to_numpy(dtype=float)
+    # DataFrame.dot propagates NaN, so a date with any missing return drops out of every portfolio
+    rows = ~np.isnan(returns).any(axis=1)
+    matrix, columns = as_weight_matrix(returns_df, weights)
+    paths = np.cumprod(1 + returns[rows] @ matrix, axis=0)
+    return pd.DataFrame(paths, index=returns_df.index[rows], columns=columns)
+
+def evaluate_portfolios(returns_df, weights, memory_budget=MEMORY_BUDGET):
+    """
+    Metrics for many portfolios at once.
+
+    Args:
+        returns_df (pd.DataFrame): periodic asset returns (dates x assets)
+        weights (pd.DataFrame or np.ndarray): (assets x K) weight matrix, one portfolio per column
+        memory_budget (int): bytes of working memory; portfolios are evaluated in column chunks
+
+    Returns:
+        pd.DataFrame: float metrics, one row per portfolio
+    """
+    returns = returns_df.to_numpy(dtype=float)
+    rows = ~np.isnan(returns).any(axis=1)
+    returns, index = returns[rows], returns_df.index[rows]
+    matrix, columns = as_weight_matrix(returns_df, weights)
+
+    # Returns, prices and two temporaries of (dates x chunk) float64 per chunk
+    chunk = max(1, memory_budget // (max(len(index), 1) * 8 * 4))
+    frames = []
+    for start in range(0, matrix.shape[1], chunk):
+        portfolio_returns = returns @ matrix[:, start:start + chunk]
+        prices = np.cumprod(1 + portfolio_returns, axis=0)
+        metrics = compute_metrics_matrix(prices, portfolio_returns, index)
+        frames.append(pd.DataFrame(metrics, index=columns[start:start + chunk], columns=METRIC_COLUMNS))
+    return pd.concat(frames)
+
+def calculate_metrics(prices_df, returns_df=None, weights_df=None):
+    """Float metrics per price column, or per weight column when returns and weights are given"""
     if weights_df is not None and returns_df is not None:
-        for col in weights_df.columns:
-            portfolio_returns = returns_df.dot(weights_df[col])
-            # Remove NaN values before cumulative product
-            portfolio_returns_clean = portfolio_returns.dropna()
-            prices = (1 + portfolio_returns_clean).cumprod()
-            start_value = prices.iloc[0]
-            end_value = prices.iloc[-1]
-            periods = (prices.index[-1] - prices.index[0]).days / 365.25
-
-            metrics[col] = calculate_individual_metrics(
-                start_value, end_value, periods, portfolio_returns_clean, prices
-            )
-    else:
-        for column in prices_df.columns:
-            prices = prices_df[column].interpolate(method='linear')
-            returns = prices.pct_change().dropna()
-            start_value = prices.iloc[0]
-            end_value = prices.iloc[-1]
-            periods = (prices.index[-1] - prices.index[0]).days / 365.25
-            
-            metrics[column] = calculate_individual_metrics(
-                start_value, end_value, periods, returns, prices
-            )
-            
-    metrics_df = pd.DataFrame(metrics).T
-    # Format numbers with 2 decimal places, show "N/A" for missing values
-    return metrics_df.map(lambda x: f"{x:.2f}" if pd.notnull(x) and isinstance(x, (int, float)) else "N/A" if pd.isnull(x) else x)
-
-def calculate_individual_metrics(start_value, end_value, periods, returns, prices):
-    # Calculate annualized return (CAGR) for whatever period is available
-    # Handle edge cases: check if we have valid start/end values and sufficient period
-    if periods > 0 and start_value > 0 and end_value > 0 and not np.isnan(start_value) and not np.isnan(end_value):
-        cagr = calculate_cagr(start_value, end_value, periods) * 100
-    else:
-        cagr = np.nan
-
-    return {
-        'Sharpe': calculate_sharpe_ratio(returns),
-        'Vol.': calculate_std_dev(returns) * 100,
-        '1m': calculate_period_return(prices, 1),
-        '3m': calculate_period_return(prices, 3),
-        'YTD': calculate_ytd_return(prices),
-        '1yr': calculate_period_return(prices, 12),
-        '3yr': calculate_period_return(prices, 36),
-        '5yr': cagr
-    }
\ No newline at end of file
+        return evaluate_portfolios(returns_df, weights_df)
+    return compute_metrics(prices_df)
+
+def format_metrics(df):
+    """Presentation copy for the PDF: numeric columns as 2-decimal strings, "N/A" for missing values"""
+    formatted = df.copy()
+    for col in formatted.select_dtypes(include='number').columns:
+        values = formatted[col]
+        formatted[col] = values.map('{:.2f}'.format).where(values.notna(), "N/A")
+    return formatted
+
+def rolling_sum(values, window):
+    """Trailing-window column sums from one cumulative sum (NaN counts as 0), NaN until the window is full"""
+    cumulative = np.cumsum(np.nan_to_num(values), axis=0)
+    sums = cumulative.copy()
+    sums[window:] -= cumulative[:-window]
+    sums[:window - 1] = np.nan
+    return sums
+
+def rolling_max(values, window=None):
+    """
+    Trailing-window column maxima in O(n) with a monotonic deque (running maxima when window is None).
+
+    NaN entries are skipped and stay NaN in the output.
+    """
+    if window is None:
+        return np.where(np.isnan(values), np.nan, np.fmax.accumulate(values, axis=0))
+    out = np.full(values.shape, np.nan)
+    for j in range(values.shape[1]):
+        column = values[:, j].tolist()
+        candidates = deque()
+        for i, value in enumerate(column):
+            if value != value:
+                continue
+            while candidates and column[candidates[-1]] <= value:
+                candidates.pop()
+            candidates.append(i)
+            if candidates[0] <= i - window:
+                candidates.popleft()
+            out[i, j] = column[candidates[0]]
+    return out
+
+def rolling_analytics(prices_df, benchmark=None, window=ROLLING_WINDOW, drawdown_window=None):
+    """
+    Rolling risk series for every column of a price frame.
+
+    Window statistics come from running sums (one cumulative sum per statistic) and
+    drawdown peaks from a running or monotonic-deque maximum, so the cost is linear
+    in the number of dates whatever the window.
+
+    Args:
+        prices_df (pd.DataFrame): prices (dates x instruments)
+        benchmark (pd.Series): benchmark prices for the rolling beta, optional
+        window (int): trading days per window for volatility, Sharpe and beta
+        drawdown_window (int): trading days for the drawdown peak, None for the running peak
+
+    Returns:
+        dict: 'Volatility' (%), 'Sharpe', 'Drawdown' (%), 'Max Drawdown' (%) and,
+        with a benchmark, 'Beta' frames aligned to prices_df
+    """
+    prices = prices_df.interpolate(method='linear').to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.vstack([np.full((1, prices.shape[1]), np.nan), prices[1:] / prices[:-1] - 1])
+        # Centering on the column mean keeps the running-sum variance numerically stable
+        centered = returns - np.nanmean(returns, axis=0)
+        observed = ~np.isnan(returns)
+        counts = rolling_sum(observed.astype(float), window)
+        full = counts == window
+
+        sum_x = rolling_sum(centered, window)
+        sum_xx = rolling_sum(centered ** 2, window)
+        variance = np.clip((sum_xx - sum_x ** 2 / window) / (window - 1), 0, None)
+        std = np.where(full, np.sqrt(variance), np.nan)
+        mean = np.where(full, rolling_sum(returns, window) / window, np.nan)
+
+        peaks = rolling_max(prices, drawdown_window)
+        drawdown = (prices / peaks - 1) * 100
+
+        analytics = {
+            'Volatility': std * np.sqrt(252) * 100,
+            'Sharpe': np.where(std == 0, 0.0, mean / std * np.sqrt(252)),
+            'Drawdown': drawdown,
+            'Max Drawdown': np.fmin.accumulate(drawdown, axis=0),
+        }
+
+        if benchmark is not None:
+            bench = benchmark.reindex(prices_df.index).interpolate(method='linear').to_numpy(dtype=float)
+            bench_returns = np.concatenate([[np.nan], bench[1:] / bench[:-1] - 1])
+            bench_centered = (bench_returns - np.nanmean(bench_returns))[:, None]
+            both = observed & ~np.isnan(bench_centered)
+            paired = np.where(both, centered, np.nan)
+            bench_paired = np.where(both, bench_centered, np.nan)
+            pair_full = rolling_sum(both.astype(float), window) == window
+            sum_b = rolling_sum(bench_paired, window)
+            covariance = rolling_sum(paired * bench_paired, window) - rolling_sum(paired, window) * sum_b / window
+            bench_variance = rolling_sum(bench_paired ** 2, window) - sum_b ** 2 / window
+            analytics['Beta'] = np.where(pair_full & (bench_variance > 0), covariance / bench_variance, np.nan)
+
+    return {name: pd.DataFrame(values, index=prices_df.index, columns=prices_df.columns) for name, values in analytics.items()}
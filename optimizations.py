@@ -1,84 +1,549 @@
-from pypfopt import HRPOpt, CLA, risk_models, expected_returns, objective_functions
+from pypfopt import HRPOpt, CLA, exceptions, risk_models, expected_returns, objective_functions
+from pypfopt.base_optimizer import BaseOptimizer
 from pypfopt.efficient_frontier import EfficientFrontier
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from functools import cached_property
 import numpy as np
 import pandas as pd
+import cvxpy as cp
+from cache import TTLCache
+from factor_risk import N_FACTORS, FactorCovariance, benchmark_factor_model, pca_factor_model
 
 # Configuration
 METHOD = 'ledoit_wolf'
 GAMMA = 0
+EMA_SPAN = 252
+COV_SPAN = 180
+# 'sample' (METHOD and exponential covariance) or a factor model: 'pca' or 'benchmark'
+COVARIANCE = 'sample'
+CLA_MAX_ASSETS = 100
 
 # Helper Functions
-def get_risk_parameters(df):
-    mu = expected_returns.mean_historical_return(df)
-    sigma = risk_models.risk_matrix(df, method=METHOD)
-    mu_ema = expected_returns.ema_historical_return(df, span=252, frequency=252)
-    sigma_ew = risk_models.exp_cov(df, span=180, frequency=252)
-    return mu, sigma, mu_ema, sigma_ew
+class RiskModel:
+    """
+    Risk estimates for one price matrix, shared by every optimizer.
+
+    Each estimate is computed lazily on first use and at most once, so a model
+    that needs only the Ledoit-Wolf inputs never pays for the exponential ones.
+    With a factor COVARIANCE, factor and factor_ew hold the low-rank-plus-diagonal
+    models and sigma/sigma_ew are their dense forms; benchmark (prices) is the
+    market factor of the 'benchmark' model.
+    """
+
+    def __init__(self, df, benchmark=None):
+        self.df = df
+        self.benchmark = benchmark
+
+    @cached_property
+    def mu(self):
+        return expected_returns.mean_historical_return(self.df)
+
+    @cached_property
+    def sigma(self):
+        if self.factor is not None:
+            return self.factor.dense()
+        return risk_models.risk_matrix(self.df, method=METHOD)
+
+    @cached_property
+    def mu_ema(self):
+        return expected_returns.ema_historical_return(self.df, span=EMA_SPAN, frequency=252)
+
+    @cached_property
+    def sigma_ew(self):
+        if self.factor_ew is not None:
+            return self.factor_ew.dense()
+        return risk_models.exp_cov(self.df, span=COV_SPAN, frequency=252)
+
+    @cached_property
+    def returns(self):
+        return self.df.pct_change().dropna()
+
+    @cached_property
+    def factor(self):
+        return factor_model(self.returns, self.benchmark)
+
+    @cached_property
+    def factor_ew(self):
+        return factor_model(self.returns, self.benchmark, span=COV_SPAN)
+
+def factor_model(returns, benchmark=None, span=None):
+    """FactorCovariance for the configured COVARIANCE, or None for the sample estimators"""
+    if COVARIANCE == 'pca':
+        return pca_factor_model(returns, N_FACTORS, span)
+    if COVARIANCE == 'benchmark':
+        benchmark_returns = benchmark.pct_change() if benchmark is not None else None
+        return benchmark_factor_model(returns, benchmark_returns, span)
+    return None
 
 def clean_weights(ef, label):
     clean = ef.clean_weights()
     return pd.DataFrame.from_dict(clean, columns=[label], orient='index')
 
+def weights_frame(weights, assets, label):
+    """Cleaned weights column from a raw weight vector, rounded like the pypfopt models"""
+    optimizer = BaseOptimizer(len(weights), list(assets))
+    optimizer.set_weights(dict(zip(assets, weights)))
+    return clean_weights(optimizer, label)
+
 # Portfolio Optimization Models
-def minvol(df_stocks):
-    mu, sigma, _, _ = get_risk_parameters(df_stocks)
-    ef = EfficientFrontier(mu, sigma)
+def minvol(risk):
+    if risk.factor is not None:
+        return weights_frame(factor_min_volatility(risk.factor), risk.factor.assets, 'Min Volatility')
+    ef = EfficientFrontier(risk.mu, risk.sigma)
     ef.min_volatility()
     return clean_weights(ef, 'Min Volatility')
 
-def ew_minvol(df_stocks):
-    _, _, mu_ema, sigma_ew = get_risk_parameters(df_stocks)
-    ef_ew = EfficientFrontier(mu_ema, sigma_ew)
+def ew_minvol(risk):
+    if risk.factor_ew is not None:
+        return weights_frame(factor_min_volatility(risk.factor_ew), risk.factor_ew.assets, 'EW Min Vol')
+    ef_ew = EfficientFrontier(risk.mu_ema, risk.sigma_ew)
     ef_ew.min_volatility()
     return clean_weights(ef_ew, 'EW Min Vol')
 
-def maxsharpe(df_stocks):
-    mu, sigma, _, _ = get_risk_parameters(df_stocks)
-    ef = EfficientFrontier(mu, sigma)
+def maxsharpe(risk):
+    if risk.factor is not None:
+        return weights_frame(factor_max_sharpe(risk.factor, risk.mu), risk.factor.assets, 'Max Sharpe')
+    ef = EfficientFrontier(risk.mu, risk.sigma)
     ef.max_sharpe()
     return clean_weights(ef, 'Max Sharpe')
 
-def ew_maxsharpe(df_stocks):
-    _, _, mu_ema, sigma_ew = get_risk_parameters(df_stocks)
-    ef_ew = EfficientFrontier(mu_ema, sigma_ew)
+def ew_maxsharpe(risk):
+    if risk.factor_ew is not None:
+        return weights_frame(factor_max_sharpe(risk.factor_ew, risk.mu_ema), risk.factor_ew.assets, 'EW Max Sharpe')
+    ef_ew = EfficientFrontier(risk.mu_ema, risk.sigma_ew)
     ef_ew.max_sharpe()
     return clean_weights(ef_ew, 'EW Max Sharpe')
 
-def non_convex(df_stocks):
-    mu, sigma, _, _ = get_risk_parameters(df_stocks)
-    ef = EfficientFrontier(mu, sigma)
-    ef.nonconvex_objective(deviation_risk_parity, ef.cov_matrix)
-    return clean_weights(ef, 'Non Convex')
+def non_convex(risk):
+    # Equal risk contribution, the portfolio the former deviation_risk_parity objective targeted
+    if risk.factor is not None:
+        return weights_frame(equal_risk_contribution(risk.factor), risk.factor.assets, 'Non Convex')
+    return weights_frame(equal_risk_contribution(risk.sigma.to_numpy()), risk.sigma.columns, 'Non Convex')
 
-def cla_max(df_stocks):
-    mu, sigma, _, _ = get_risk_parameters(df_stocks)
-    ef_cla = CLA(mu, sigma)
+def cla_max(risk):
+    # CLA works on the dense matrix and slows cubically; past CLA_MAX_ASSETS the factor model's
+    # tangency portfolio (the same optimum) is solved directly
+    if risk.factor is not None and len(risk.factor.assets) > CLA_MAX_ASSETS:
+        return weights_frame(factor_max_sharpe(risk.factor, risk.mu), risk.factor.assets, 'CLA Max Sharpe')
+    ef_cla = CLA(risk.mu, risk.sigma)
     ef_cla.max_sharpe()
     return clean_weights(ef_cla, 'CLA Max Sharpe')
 
-def HRP(df_stocks):
-    df_returns = df_stocks.pct_change().dropna()
-    hrp = HRPOpt(df_returns, risk_models.risk_matrix(df_stocks, method=METHOD))
+def HRP(risk):
+    # HRPOpt clusters on the returns' own correlation when given returns, so a factor model is passed alone
+    hrp = HRPOpt(cov_matrix=risk.sigma) if risk.factor is not None else HRPOpt(risk.returns, risk.sigma)
     hrp.optimize()
     clean = hrp.clean_weights()
     return pd.DataFrame.from_dict(clean, columns=['HRP'], orient='index')
 
-def df_equal(df_stocks):
+def df_equal(risk):
+    df_stocks = risk.df
     clean = np.full(df_stocks.shape[1], 1/df_stocks.shape[1])
     return pd.DataFrame(clean, columns=['Equal'], index=df_stocks.columns)
 
+def random_portfolios(df_stocks, count, seed=None):
+    """Long-only weights drawn uniformly from the simplex, one portfolio per column (for metrics.evaluate_portfolios)"""
+    rng = np.random.default_rng(seed)
+    weights = rng.dirichlet(np.ones(df_stocks.shape[1]), size=count).T
+    return pd.DataFrame(weights, index=df_stocks.columns)
+
+# Efficient Frontier
+FRONTIER_POINTS = 50
+# pypfopt's CLA finds about one turning point per asset in pure Python; past this size the sweep is faster
+CLA_FRONTIER_MAX_ASSETS = 25
+
+def frontier_inputs(risk, exponential=False):
+    return (risk.mu_ema, risk.sigma_ew) if exponential else (risk.mu, risk.sigma)
+
+def efficient_frontier(risk, points=FRONTIER_POINTS, exponential=False):
+    """
+    Annual volatility and expected return (%) of up to `points` efficient portfolios,
+    from the minimum-volatility portfolio to the highest expected return.
+
+    Up to CLA_FRONTIER_MAX_ASSETS assets the frontier comes from one CLA run: its turning
+    points are exact, and portfolios between two of them are their linear blends, so every
+    point is interpolated rather than solved. Larger universes fall back to frontier_sweep.
+    """
+    mu, sigma = frontier_inputs(risk, exponential)
+    if len(mu) > CLA_FRONTIER_MAX_ASSETS:
+        return frontier_sweep(mu, sigma, points)
+    cla = CLA(mu, sigma)
+    try:
+        cla.efficient_frontier(points)
+    except (ValueError, ArithmeticError, np.linalg.LinAlgError):
+        # Singular covariance, which CLA's unconstrained steps cannot invert
+        return frontier_sweep(mu, sigma, points)
+
+    # CLA lists turning points from the highest return down; reversed, returns ascend as np.interp needs
+    corners = np.array([w.ravel() for w in cla.w[::-1]])
+    returns = corners @ mu.to_numpy()
+    targets = np.linspace(returns[0], returns[-1], points)
+    weights = np.column_stack([np.interp(targets, returns, corners[:, i]) for i in range(corners.shape[1])])
+    return frontier_points(weights, mu, sigma)
+
+def frontier_sweep(mu, sigma, points=FRONTIER_POINTS):
+    """
+    Frontier by target-return sweep, one warm-started solve per point.
+
+    The sweep reuses one EfficientFrontier: pypfopt keeps the compiled problem (and its
+    covariance factorization) and only updates the target-return parameter, and OSQP
+    warm-starts each solve from the previous point. Unreachable targets are skipped.
+    """
+    ef_min = EfficientFrontier(mu, sigma)
+    ef_min.min_volatility()
+    low, high = ef_min.portfolio_performance()[0], mu.max()
+
+    # Stop just short of the single-asset corner, which solvers reach only within tolerance
+    targets = low + (high - low) * np.linspace(0, 1 - 1e-6, points) if high > low else [low]
+    ef = EfficientFrontier(mu, sigma, solver='OSQP')
+    weights = []
+    for target in targets:
+        try:
+            ef.efficient_return(float(target))
+        except (exceptions.OptimizationError, ValueError):
+            continue
+        weights.append(ef.weights.copy())
+
+    weights = np.array(weights) if weights else ef_min.weights[None, :]
+    return frontier_points(weights, mu, sigma)
+
+def frontier_points(weights, mu, sigma):
+    """Annual volatility and expected return (%) of each row of a weight matrix"""
+    sigma = sigma.to_numpy()
+    return pd.DataFrame({
+        'Volatility': np.sqrt(np.einsum('ij,jk,ik->i', weights, sigma, weights)) * 100,
+        'Return': weights @ mu.to_numpy() * 100,
+    })
+
+def portfolio_point(risk, weights, exponential=False):
+    """Volatility and expected return (%) of one portfolio on the frontier's axes"""
+    mu, sigma = frontier_inputs(risk, exponential)
+    weights = np.asarray(weights, dtype=float)[None, :]
+    return frontier_points(weights, mu, sigma).iloc[0]
+
 # Objective Functions
 def objective_sharpe_gamma(w, mu, s):
     return objective_functions.sharpe_ratio(w, mu, s) + objective_functions.L2_reg(w, gamma=GAMMA)
 
-def deviation_risk_parity(w, cov_matrix):
-    diff = w * np.dot(cov_matrix, w) - (w * np.dot(cov_matrix, w)).reshape(-1, 1)
-    return np.sum(diff ** 2)
+def equal_risk_contribution(cov_matrix, tol=1e-10, max_iter=100):
+    """
+    Long-only weights whose risk contributions w_i * (cov_matrix @ w)_i are all equal.
+
+    Newton's method (Spinu, 2013) on the convex problem min 0.5 x'Sx - sum(log x) / n,
+    whose solution is the ERC portfolio up to scale. A backtracking line search keeps
+    x positive and the objective decreasing, so it converges from the inverse-volatility
+    start whatever the correlations (hedged or inverse funds included), quadratically
+    near the solution. A FactorCovariance is solved without forming S, in O(n k^2) per step.
+
+    Raises exceptions.OptimizationError if the objective is unbounded (a singular S with a
+    riskless long-only combination) or it has not converged after max_iter steps.
+    """
+    if isinstance(cov_matrix, FactorCovariance):
+        return factor_equal_risk_contribution(cov_matrix, tol, max_iter)
+    cov_matrix = np.asarray(cov_matrix, dtype=float)
+
+    def newton_step(x, gradient, budget):
+        hessian = cov_matrix + np.diag(budget / x ** 2)
+        return np.linalg.solve(hessian, gradient)
+
+    return newton_risk_parity(cov_matrix.dot, newton_step, np.diag(cov_matrix), tol, max_iter)
+
+def factor_equal_risk_contribution(factor, tol=1e-10, max_iter=100):
+    """equal_risk_contribution() for S = B F B' + diag(d), Newton systems solved with the Woodbury identity"""
+    loadings, factor_cov = factor.loadings, factor.factor_cov
+
+    def newton_step(x, gradient, budget):
+        # (A + B F B')^-1 g with A = diag(d + b / x^2), via the k x k system I + F B' A^-1 B
+        inv_diag = 1 / (factor.specific + budget / x ** 2)
+        scaled = loadings * inv_diag[:, None]
+        core = np.eye(factor.n_factors) + factor_cov @ (loadings.T @ scaled)
+        return inv_diag * gradient - scaled @ np.linalg.solve(core, factor_cov @ (scaled.T @ gradient))
+
+    return newton_risk_parity(factor.dot, newton_step, factor.diag(), tol, max_iter)
+
+def newton_risk_parity(product, newton_step, diag, tol, max_iter):
+    """Newton iterations with a backtracking line search, shared by the ERC solvers; product(x) is S @ x"""
+    n_assets = len(diag)
+    budget = 1 / n_assets
+
+    def objective(x):
+        sx = product(x)
+        return 0.5 * x @ sx - budget * np.log(x).sum(), sx
+
+    # Inverse-volatility start, scaled to the best point on its ray (x'Sx = 1)
+    x = 1 / np.sqrt(diag)
+    x /= np.sqrt(x @ product(x))
+    value, sx = objective(x)
+    for _ in range(max_iter):
+        gradient = sx - budget / x
+        try:
+            step = newton_step(x, gradient, budget)
+        except np.linalg.LinAlgError:
+            break
+        decrement = gradient @ step
+        if not np.isfinite(decrement):
+            break
+        if decrement <= tol * budget:
+            # Inside the quadratic region: one full step leaves an error of order decrement^2
+            x = x - step
+            if x.min() > 0:
+                return x / x.sum()
+            break
+        # Halve the full Newton step until it stays positive and decreases the objective
+        size = 1.0
+        while size > 1e-10:
+            candidate = x - size * step
+            if candidate.min() > 0:
+                candidate_value, candidate_sx = objective(candidate)
+                if candidate_value <= value - 0.25 * size * decrement:
+                    break
+            size *= 0.5
+        else:
+            break
+        x, value, sx = candidate, candidate_value, candidate_sx
+    raise exceptions.OptimizationError("Equal risk contribution did not converge; the covariance may be singular")
+
+def solve_factor_problem(objective, constraints):
+    problem = cp.Problem(cp.Minimize(objective), constraints)
+    problem.solve()
+    if problem.status not in ("optimal", "optimal_inaccurate"):
+        raise exceptions.OptimizationError(f"Solver status: {problem.status}")
+
+def factor_min_volatility(factor):
+    """Long-only minimum variance under a FactorCovariance, O(n k) problem size"""
+    w = cp.Variable(len(factor.assets))
+    solve_factor_problem(factor.cvxpy_variance(w), [cp.sum(w) == 1, w >= 0])
+    return w.value
+
+def factor_max_sharpe(factor, mu, risk_free_rate=0.0):
+    """Long-only tangency portfolio under a FactorCovariance, with pypfopt's max_sharpe substitution"""
+    excess = np.asarray(mu, dtype=float) - risk_free_rate
+    if excess.max() <= 0:
+        raise ValueError("at least one of the assets must have an expected return exceeding the risk-free rate")
+    y, k = cp.Variable(len(factor.assets)), cp.Variable()
+    solve_factor_problem(factor.cvxpy_variance(y), [excess @ y == 1, cp.sum(y) == k, k >= 0, y >= 0])
+    return y.value / k.value
 
 # Main Optimization Function
-def optimize(df_stocks):
-    models = [
-        minvol(df_stocks), ew_minvol(df_stocks), maxsharpe(df_stocks), ew_maxsharpe(df_stocks),
-        non_convex(df_stocks), cla_max(df_stocks), HRP(df_stocks), df_equal(df_stocks)
-    ]
-    return pd.concat(models, axis=1)
+MODELS = {
+    'Min Volatility': minvol, 'EW Min Vol': ew_minvol, 'Max Sharpe': maxsharpe, 'EW Max Sharpe': ew_maxsharpe,
+    'Non Convex': non_convex, 'CLA Max Sharpe': cla_max, 'HRP': HRP, 'Equal': df_equal,
+}
+
+def optimize(df_stocks, benchmark=None):
+    risk = RiskModel(df_stocks, benchmark)
+    return pd.concat([model(risk) for model in MODELS.values()], axis=1)
+
+# Parallel execution: a reused pool with one worker per model, time budget per model (seconds)
+MODEL_TIMEOUT = 30
+# Workers start from a clean forkserver with the solvers preloaded, never from a fork of the
+# (multithreaded) app process; spawn where forkserver is unavailable
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+class ModelPool:
+    """
+    Worker processes shared by every optimize_iter() call.
+
+    The pool is started on first use and reused, so pypfopt and cvxpy are imported
+    once per worker rather than once per call. A model that timed out keeps its
+    worker busy, so the pool is then terminated as soon as no call is using it and
+    the next call starts fresh workers.
+    """
+
+    def __init__(self, processes=len(MODELS)):
+        self.processes = processes
+        self._pool = None
+        self._users = 0
+        self._stale = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._pool is None:
+                context = multiprocessing.get_context(START_METHOD)
+                if START_METHOD == 'forkserver':
+                    # Installed packages only: the forkserver does not see the app's sys.path
+                    context.set_forkserver_preload(['numpy', 'pandas', 'cvxpy', 'pypfopt'])
+                self._pool = context.Pool(processes=self.processes)
+            self._users += 1
+            return self._pool
+
+    def release(self, stale=False):
+        with self._lock:
+            self._users -= 1
+            self._stale = self._stale or stale
+            if self._stale and self._users == 0:
+                self._pool.terminate()
+                self._pool, self._stale = None, False
+
+MODEL_POOL = ModelPool()
+
+def run_model(label, risk):
+    return MODELS[label](risk)
+
+def optimize_iter(df_stocks, timeout=MODEL_TIMEOUT, risk=None, models=None):
+    """
+    Run every model (or the listed ones) on MODEL_POOL and yield (label, weights, error) as each finishes.
+
+    The shared estimates are computed once here and shipped with the context. Models
+    still running after `timeout` seconds are yielded last with a TimeoutError and
+    their workers are replaced; a model that raises is yielded with its exception.
+    """
+    if risk is None:
+        risk = RiskModel(df_stocks)
+    # A factor COVARIANCE ships only the low-rank models; HRP and CLA build the dense matrix if they need it
+    covariances = ('sigma', 'sigma_ew') if COVARIANCE == 'sample' else ('factor', 'factor_ew')
+    for estimate in ('mu', 'mu_ema', 'returns') + covariances:
+        getattr(risk, estimate)
+
+    models = list(MODELS) if models is None else models
+    finished = queue.Queue()
+    pool = MODEL_POOL.acquire()
+    pending = set(models)
+    try:
+        for label in models:
+            pool.apply_async(
+                run_model, (label, risk),
+                callback=lambda weights, label=label: finished.put((label, weights, None)),
+                error_callback=lambda error, label=label: finished.put((label, None, error)),
+            )
+        deadline = time.monotonic() + timeout
+        while pending:
+            try:
+                label, weights, error = finished.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            pending.discard(label)
+            yield label, weights, error
+        for label in models:
+            if label in pending:
+                yield label, None, TimeoutError(f"{label} did not finish within {timeout}s")
+    finally:
+        MODEL_POOL.release(stale=bool(pending))
+
+def run_models(df_stocks, timeout=MODEL_TIMEOUT, on_result=None, risk=None, models=None):
+    """({label: weights}, {label: error}) of the models run by optimize_iter()"""
+    results, errors = {}, {}
+    for label, weights, error in optimize_iter(df_stocks, timeout, risk, models):
+        if error is None:
+            results[label] = weights
+        else:
+            errors[label] = error
+        if on_result is not None:
+            on_result(label, error)
+    return results, errors
+
+def combine_results(results, errors):
+    """Weights in the usual column order; if no model succeeded, the first error is raised"""
+    if not results:
+        raise next(iter(errors.values()))
+    return pd.concat([results[label] for label in MODELS if label in results], axis=1)
+
+def optimize_parallel(df_stocks, timeout=MODEL_TIMEOUT, on_result=None, risk=None):
+    """
+    Parallel optimize(): weights of the models that finished, in the usual column order,
+    and a {label: error} dict for the ones that failed or timed out.
+
+    on_result(label, error) is called as each model finishes, e.g. to update progress.
+    If no model succeeds, the first error is raised.
+    """
+    results, errors = run_models(df_stocks, timeout, on_result, risk)
+    return combine_results(results, errors), errors
+
+# Memoized results: weights and model errors per content hash of prices and configuration, in memory and on disk
+OPTIMIZATION_CACHE = TTLCache(ttl=7 * 86400, max_entries=32)
+OPTIMIZATION_DIR = os.path.join(os.path.dirname(__file__), "data", "optimizations")
+OPTIMIZATION_DISK_ENTRIES = 256  # 0 disables the disk tier
+# Failures that repeat on the same inputs are stored with the weights; a model that timed out
+# is retried on this many later runs before its timeout is stored as well
+DETERMINISTIC_ERRORS = (exceptions.OptimizationError, ValueError, ArithmeticError)
+TIMEOUT_RETRIES = 1
+
+def optimization_key(df_stocks, benchmark=None):
+    """Content hash of the price matrix (and benchmark prices) and everything the models depend on"""
+    digest = hashlib.sha256(repr((METHOD, GAMMA, EMA_SPAN, COV_SPAN, COVARIANCE, N_FACTORS, list(MODELS))).encode())
+    for prices in (df_stocks, benchmark):
+        if prices is None:
+            continue
+        prices = pd.DataFrame(prices)
+        digest.update(repr(list(prices.columns)).encode())
+        digest.update(prices.index.to_numpy(dtype='datetime64[ns]').tobytes())
+        digest.update(np.ascontiguousarray(prices.to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+def load_cached_result(key):
+    path = os.path.join(OPTIMIZATION_DIR, f"{key}.pkl")
+    if not OPTIMIZATION_DISK_ENTRIES or not os.path.exists(path):
+        return None
+    try:
+        entry = pd.read_pickle(path)
+    except Exception:
+        return None
+    if not isinstance(entry, dict):
+        return None
+    # Touch on use so pruning evicts the least recently used files
+    os.utime(path)
+    return entry
+
+def save_cached_result(key, entry):
+    if not OPTIMIZATION_DISK_ENTRIES:
+        return
+    os.makedirs(OPTIMIZATION_DIR, exist_ok=True)
+    path = os.path.join(OPTIMIZATION_DIR, f"{key}.pkl")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pd.to_pickle(entry, tmp_path)
+    os.replace(tmp_path, path)
+
+    files = [os.path.join(OPTIMIZATION_DIR, name) for name in os.listdir(OPTIMIZATION_DIR) if name.endswith(".pkl")]
+    if len(files) > OPTIMIZATION_DISK_ENTRIES:
+        files.sort(key=os.path.getmtime)
+        for old in files[:len(files) - OPTIMIZATION_DISK_ENTRIES]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+def optimize_cached(df_stocks, timeout=MODEL_TIMEOUT, on_result=None, risk=None, key=None):
+    """
+    optimize_parallel() memoized by optimization_key(): repeated reruns on the same prices
+    and configuration return a copy of the stored weights and errors without running any model.
+
+    Results are stored with the errors in DETERMINISTIC_ERRORS (e.g. Max Sharpe when no asset
+    beats the risk-free rate), so those are not retried. Models that timed out are rerun alone
+    on up to TIMEOUT_RETRIES later calls; any other error leaves the result unstored.
+    A caller that already hashed the prices passes the key to skip hashing them again.
+    """
+    if key is None:
+        key = optimization_key(df_stocks, risk.benchmark if risk is not None else None)
+    entry = OPTIMIZATION_CACHE.get(key)
+    if entry is None:
+        entry = load_cached_result(key)
+        if entry is not None:
+            OPTIMIZATION_CACHE.set(key, entry)
+
+    if entry is None:
+        results, errors, models, retries = {}, {}, list(MODELS), 0
+    else:
+        errors = dict(entry['errors'])
+        models = [label for label, error in errors.items() if isinstance(error, TimeoutError)]
+        if not models or entry['retries'] >= TIMEOUT_RETRIES:
+            return entry['weights'].copy(), errors
+        results = {label: entry['weights'][[label]] for label in entry['weights'].columns}
+        retries = entry['retries'] + 1
+        for label in models:
+            del errors[label]
+
+    new_results, new_errors = run_models(df_stocks, timeout, on_result, risk, models)
+    results.update(new_results)
+    errors.update(new_errors)
+    weights_df = combine_results(results, errors)
+    if all(isinstance(error, DETERMINISTIC_ERRORS + (TimeoutError,)) for error in errors.values()):
+        entry = {'weights': weights_df, 'errors': errors, 'retries': retries}
+        OPTIMIZATION_CACHE.set(key, entry)
+        save_cached_result(key, entry)
+    return weights_df.copy(), errors
@@ -0,0 +1,90 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+# Declarative per-instrument patches, keyed by the pair_ID selected in the app:
+#   price_alias:    fetch prices from another pair_ID
+#   holdings_alias: fetch holdings from another pair_ID
+#   overlay:        CSV of daily returns ('Date', 'Daily Return') filling gaps in the fetched prices
+#   cleaning:       outlier filter applied to the fetched prices ('standard' when absent)
+#   underlying:     {top holding name: pair_ID} of funds held by a fund of funds, expanded in look-through
+SERIES_OVERRIDES = {
+    1196641: {"overlay": "KMLM.csv"},       # KMLM: scraped prices are combined with historical returns
+    1191927: {"price_alias": 959362},       # TFLO: alternative data source
+    1024340: {"holdings_alias": 40690},     # XLPS: holdings of XLP
+    45429: {"cleaning": "aggressive"},      # ETF with known data quality issues
+}
+
+BASE_DIR = os.path.dirname(__file__)
+COMPILED_DIR = os.path.join(BASE_DIR, "data", "overlays")
+OVERLAY_DTYPE = np.dtype([('date', 'M8[ns]'), ('growth', 'f8')])
+
+_overlays = {}
+_lock = threading.Lock()
+
+def get_override(pair_id):
+    return SERIES_OVERRIDES.get(int(pair_id), {})
+
+def price_pair_id(pair_id):
+    """pair_ID whose prices stand in for pair_id"""
+    return get_override(pair_id).get("price_alias", pair_id)
+
+def holdings_pair_id(pair_id):
+    """pair_ID whose holdings stand in for pair_id"""
+    return get_override(pair_id).get("holdings_alias", pair_id)
+
+def underlying_funds(pair_id):
+    """Top holdings of pair_id that are themselves funds, as {holding name: pair_ID}"""
+    return get_override(pair_id).get("underlying", {})
+
+def cleaning_rule(pair_id):
+    return get_override(pair_id).get("cleaning", "standard")
+
+def compile_overlay(csv_path, compiled_path):
+    """Convert a CSV of daily returns into a binary array of dates and cumulative growth factors"""
+    daily_data = pd.read_csv(csv_path, parse_dates=['Date'])
+    overlay = np.empty(len(daily_data), dtype=OVERLAY_DTYPE)
+    overlay['date'] = daily_data['Date'].to_numpy(dtype='datetime64[ns]')
+    overlay['growth'] = (1 + daily_data['Daily Return']).cumprod().to_numpy()
+    os.makedirs(os.path.dirname(compiled_path), exist_ok=True)
+    tmp_path = f"{compiled_path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, overlay)
+    os.replace(tmp_path, compiled_path)
+
+def get_overlay(pair_id):
+    """
+    Memory-mapped overlay for pair_id, or None if it has none.
+
+    The CSV is compiled once (again only when it changes) and the mapped array is
+    shared by every call in the process.
+    """
+    pair_id = int(pair_id)
+    csv_name = get_override(pair_id).get("overlay")
+    if csv_name is None:
+        return None
+    csv_path = os.path.join(BASE_DIR, csv_name)
+    compiled_path = os.path.join(COMPILED_DIR, f"{pair_id}.npy")
+    csv_mtime = os.path.getmtime(csv_path)
+
+    with _lock:
+        cached = _overlays.get(pair_id)
+        if cached is not None and cached[0] == csv_mtime:
+            return cached[1]
+        if not os.path.exists(compiled_path) or os.path.getmtime(compiled_path) < csv_mtime:
+            compile_overlay(csv_path, compiled_path)
+        overlay = np.load(compiled_path, mmap_mode='r')
+        _overlays[pair_id] = (csv_mtime, overlay)
+    return overlay
+
+def apply_overlay(prices, overlay, start, end):
+    """
+    Fill prices with the overlay's returns, scaled to the first fetched price.
+
+    Fetched prices take precedence; overlay dates missing from them are added.
+    The result is limited to [start, end].
+    """
+    overlay_prices = pd.Series(prices.iloc[0] * overlay['growth'], index=pd.DatetimeIndex(overlay['date']))
+    combined = prices.combine_first(overlay_prices)
+    combined = combined[(combined.index >= start) & (combined.index <= end)]
+    return combined.loc[~combined.index.duplicated(keep='first')]
@@ -0,0 +1,169 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta
+import pandas as pd
+
+# On-disk price history, one row per pair_ID and date, and dividend history per ticker
+STORE_PATH = os.path.join(os.path.dirname(__file__), "data", "prices.sqlite")
+DATE_FORMAT = '%d%m%Y'
+
+def connect(path=STORE_PATH):
+    """Open the price store, creating the schema on first use"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS prices ("
+        "pair_id INTEGER NOT NULL, date TEXT NOT NULL, price REAL NOT NULL, "
+        "PRIMARY KEY (pair_id, date))"
+    )
+    # covered_from: earliest requested start already downloaded; refreshed: last delta refresh day
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS coverage ("
+        "pair_id INTEGER PRIMARY KEY, covered_from TEXT NOT NULL, refreshed TEXT NOT NULL)"
+    )
+    # Dividends per ticker, with the earliest start downloaded and the day they were fetched
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS dividends ("
+        "ticker TEXT NOT NULL, date TEXT NOT NULL, amount REAL NOT NULL, "
+        "PRIMARY KEY (ticker, date))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS dividend_coverage ("
+        "ticker TEXT PRIMARY KEY, covered_from TEXT NOT NULL, refreshed TEXT NOT NULL)"
+    )
+    return conn
+
+def load_prices(conn, pair_id):
+    """Return the full stored history of a pair as a date-indexed Series"""
+    rows = conn.execute(
+        "SELECT date, price FROM prices WHERE pair_id = ? ORDER BY date", (int(pair_id),)
+    ).fetchall()
+    if not rows:
+        return pd.Series(dtype=float, name='price')
+    dates, prices = zip(*rows)
+    return pd.Series(prices, index=pd.to_datetime(dates), name='price')
+
+def save_prices(conn, pair_id, prices):
+    """Insert or overwrite stored prices for a pair"""
+    prices = prices.dropna()
+    rows = [(int(pair_id), date.strftime('%Y-%m-%d'), float(price)) for date, price in prices.items()]
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO prices (pair_id, date, price) VALUES (?, ?, ?)", rows)
+
+def get_coverage(conn, pair_id):
+    """Return (covered_from, refreshed) for a pair, or (None, None) if it was never downloaded"""
+    row = conn.execute(
+        "SELECT covered_from, refreshed FROM coverage WHERE pair_id = ?", (int(pair_id),)
+    ).fetchone()
+    return (datetime.strptime(row[0], '%Y-%m-%d'), row[1]) if row else (None, None)
+
+def set_coverage(conn, pair_id, covered_from, refreshed):
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO coverage (pair_id, covered_from, refreshed) VALUES (?, ?, ?)",
+            (int(pair_id), covered_from.strftime('%Y-%m-%d'), refreshed)
+        )
+
+def get_prices(pair_id, start, end, download, path=STORE_PATH):
+    """
+    Return prices for pair_id between start and end ('%d%m%Y' strings).
+
+    download(pair_id, start, end) returns a date-indexed Series, empty when the source
+    has nothing in that window, and raises when the source is unavailable.
+    Only the days missing from the store are passed to it:
+    the full window on first use, an older window when start predates the stored
+    history, and the days from the last stored date on at most once per day.
+    """
+    start_dt, end_dt = datetime.strptime(start, DATE_FORMAT), datetime.strptime(end, DATE_FORMAT)
+    conn = connect(path)
+    try:
+        stored = load_prices(conn, pair_id)
+        covered_from, refreshed = get_coverage(conn, pair_id)
+        today = datetime.today().strftime('%Y-%m-%d')
+
+        if stored.empty or covered_from is None:
+            downloaded = download(pair_id, start, end)
+            if downloaded.empty:
+                raise ValueError(f"No prices available for pair {pair_id}")
+            save_prices(conn, pair_id, downloaded)
+            set_coverage(conn, pair_id, start_dt, today)
+        else:
+            # Backfill when the requested window starts before anything downloaded so far
+            if start_dt < covered_from:
+                backfill_end = (covered_from - timedelta(days=1)).strftime(DATE_FORMAT)
+                try:
+                    # An empty result means nothing older exists (e.g. launched after start), which is covered too
+                    save_prices(conn, pair_id, download(pair_id, start, backfill_end))
+                    covered_from = start_dt
+                except Exception:
+                    # Source unavailable: serve the stored history and retry the backfill on the next call
+                    pass
+            # Delta refresh from the last stored date, at most once per day. That date is
+            # fetched again so a provisional intraday price is overwritten by the close
+            last = stored.index[-1]
+            if last < end_dt and refreshed != today:
+                try:
+                    save_prices(conn, pair_id, download(pair_id, last.strftime(DATE_FORMAT), end))
+                    refreshed = today
+                except Exception:
+                    # Source unavailable: keep the stored history and retry on the next call
+                    pass
+            set_coverage(conn, pair_id, covered_from, refreshed)
+
+        prices = load_prices(conn, pair_id)
+    finally:
+        conn.close()
+
+    return prices[(prices.index >= start_dt) & (prices.index <= end_dt)]
+
+def load_dividends(conn, ticker, start):
+    """Return the stored dividends of a ticker since start ('%Y-%m-%d') as a date-indexed Series"""
+    rows = conn.execute(
+        "SELECT date, amount FROM dividends WHERE ticker = ? AND date >= ? ORDER BY date", (ticker, start)
+    ).fetchall()
+    if not rows:
+        return pd.Series(dtype=float)
+    dates, amounts = zip(*rows)
+    return pd.Series(amounts, index=pd.to_datetime(dates))
+
+def save_dividends(conn, ticker, start, dividends, refreshed):
+    """Replace the stored dividends of a ticker since start and record them as fetched on refreshed"""
+    rows = [(ticker, date.strftime('%Y-%m-%d'), float(amount)) for date, amount in dividends.dropna().items()]
+    with conn:
+        conn.execute("DELETE FROM dividends WHERE ticker = ? AND date >= ?", (ticker, start))
+        conn.executemany("INSERT OR REPLACE INTO dividends (ticker, date, amount) VALUES (?, ?, ?)", rows)
+        conn.execute(
+            "INSERT OR REPLACE INTO dividend_coverage (ticker, covered_from, refreshed) VALUES (?, ?, ?)",
+            (ticker, start, refreshed)
+        )
+
+def get_dividends(tickers, start, download, path=STORE_PATH):
+    """
+    Return {ticker: dividends since start ('%Y-%m-%d')}.
+
+    Tickers fetched today from start or earlier are served from the store; the
+    rest are passed to download(tickers, start) in one batch and stored. A failed
+    download raises and stores nothing.
+    """
+    today = datetime.today().strftime('%Y-%m-%d')
+    conn = connect(path)
+    try:
+        results, missing = {}, []
+        for ticker in tickers:
+            row = conn.execute(
+                "SELECT covered_from, refreshed FROM dividend_coverage WHERE ticker = ?", (ticker,)
+            ).fetchone()
+            if row is not None and row[0] <= start and row[1] == today:
+                results[ticker] = load_dividends(conn, ticker, start)
+            else:
+                missing.append(ticker)
+
+        if missing:
+            for ticker, dividends in download(missing, start).items():
+                save_dividends(conn, ticker, start, dividends, today)
+                results[ticker] = dividends
+    finally:
+        conn.close()
+
+    return results
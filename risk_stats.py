@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+from statistics import NormalDist
+from metrics import as_weight_matrix
+
+VAR_LEVEL = 0.95
+RISK_COLUMNS = ['Sortino', 'Max DD', 'DD Days', 'VaR 95', 'CVaR 95', 'P-VaR 95', 'P-CVaR 95', 'Best Y', 'Worst Y']
+
+def first_valid(values):
+    """First non-NaN value of each column"""
+    valid = ~np.isnan(values)
+    rows = np.where(valid.any(axis=0), valid.argmax(axis=0), 0)
+    return values[rows, np.arange(values.shape[1])]
+
+def calendar_year_matrix(prices, index):
+    """
+    Calendar-year returns (%) of each column, one row per year.
+
+    Each year runs from the previous year's last price (or the first price of the
+    series) to the year's last price, as compounding that year's daily returns would.
+    """
+    years = index.year.to_numpy()
+    ends = np.append(np.flatnonzero(np.diff(years) != 0), len(years) - 1)
+    end_prices = prices[ends]
+    bases = np.vstack([np.full((1, prices.shape[1]), np.nan), end_prices[:-1]])
+    bases = np.where(np.isnan(bases), first_valid(prices), bases)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (end_prices / bases - 1) * 100, years[ends]
+
+def compute_risk_matrix(prices, returns, index, level=VAR_LEVEL):
+    """
+    Extended risk statistics for all columns in one vectorized pass.
+
+    Args:
+        prices (np.ndarray): (T x K) prices, NaN where a series has not started
+        returns (np.ndarray): (T' x K) daily returns, NaN entries are ignored
+        index (pd.DatetimeIndex): dates of the price rows
+        level (float): confidence level for VaR and CVaR
+
+    Returns:
+        dict: arrays per RISK_COLUMNS entry; drawdowns, VaR and CVaR are positive
+        percentages of loss, VaR/CVaR are daily
+    """
+    n_rows, n_cols = prices.shape
+    alpha = 1 - level
+    stats = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Sortino against a zero target
+        mean = np.nanmean(returns, axis=0)
+        downside = np.sqrt(np.nanmean(np.minimum(returns, 0) ** 2, axis=0))
+        stats['Sortino'] = np.where(downside == 0, np.nan, mean / downside * np.sqrt(252))
+
+        # Drawdown depth and the longest time (calendar days) spent below a previous peak
+        peaks = np.fmax.accumulate(prices, axis=0)
+        drawdown = prices / peaks - 1
+        stats['Max DD'] = -np.nanmin(drawdown, axis=0) * 100
+        at_peak = ~(drawdown < 0)
+        last_peak = np.maximum.accumulate(np.where(at_peak, np.arange(n_rows)[:, None], 0), axis=0)
+        days = index.to_numpy().astype('datetime64[D]').astype(np.int64)
+        stats['DD Days'] = np.max(days[:, None] - days[last_peak], axis=0).astype(float)
+
+        # Historical VaR/CVaR from the empirical distribution of daily returns
+        quantile = np.nanquantile(returns, alpha, axis=0)
+        tail = np.where(returns <= quantile, returns, np.nan)
+        stats['VaR 95'] = -quantile * 100
+        stats['CVaR 95'] = -np.nanmean(tail, axis=0) * 100
+
+        # Parametric (Gaussian) VaR/CVaR
+        std = np.nanstd(returns, axis=0, ddof=1)
+        z = NormalDist().inv_cdf(alpha)
+        stats['P-VaR 95'] = -(mean + z * std) * 100
+        stats['P-CVaR 95'] = -(mean - std * NormalDist().pdf(z) / alpha) * 100
+
+        yearly, _ = calendar_year_matrix(prices, index)
+        has_year = (~np.isnan(yearly)).any(axis=0)
+        stats['Best Y'] = np.where(has_year, np.max(np.where(np.isnan(yearly), -np.inf, yearly), axis=0), np.nan)
+        stats['Worst Y'] = np.where(has_year, np.min(np.where(np.isnan(yearly), np.inf, yearly), axis=0), np.nan)
+
+    return stats
+
+def calculate_risk_statistics(prices_df, returns_df=None, weights_df=None, level=VAR_LEVEL):
+    """Float risk statistics per price column, or per weight column when returns and weights are given"""
+    if weights_df is not None and returns_df is not None:
+        returns = returns_df.to_numpy(dtype=float)
+        rows = ~np.isnan(returns).any(axis=1)
+        matrix, columns = as_weight_matrix(returns_df, weights_df)
+        portfolio_returns = returns[rows] @ matrix
+        index = returns_df.index[rows]
+        # Start each path at 1 on the first return date so its first return counts
+        prices = np.vstack([np.ones((1, matrix.shape[1])), np.cumprod(1 + portfolio_returns, axis=0)])
+        index = index[:1].append(index)
+        stats = compute_risk_matrix(prices, portfolio_returns, index, level)
+    else:
+        prices = prices_df.interpolate(method='linear').to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = prices[1:] / prices[:-1] - 1
+        columns = prices_df.columns
+        stats = compute_risk_matrix(prices, returns, prices_df.index, level)
+    return pd.DataFrame(stats, index=columns, columns=RISK_COLUMNS)
@@ -1,31 +1,137 @@
-import cloudscraper
 import json
+import threading
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import client
+from cache import TTLCache
+from catalog import CATALOG
 
-def fetch_search_results(query, key):
-    scraper = cloudscraper.create_scraper()
-    url = "https://aappapi.investing.com/search_by_type.php"
-    params = {
-        "section": "quotes",
-        "string": query,
-        "lang_ID": 1,
-    }
-    headers = {"x-meta-ver": "14"}
+# Search results by normalized query, shared by every search box and session
+SEARCH_CACHE = TTLCache(ttl=3600, max_entries=2048)
+
+class SearchError(Exception):
+    """Search request failed after the client's retries"""
+
+class SearchService:
+    """
+    Typeahead search over search_by_type.php.
+
+    Queries are answered, in order, from the cache, from substring matches in the
+    local instrument catalog when those can stand in for the API (see from_catalog),
+    from the cached results of a shorter prefix when those were complete, and only
+    then from the network. Catalog matches, then typo-tolerant ones, are the fallback
+    when the network finds nothing or fails.
+    A response is complete when it holds fewer quotes than the largest response seen,
+    since the API then returned every match it had.
+    """
 
-    response = scraper.get(url, params=params, headers=headers)
-    if response.status_code == 200:
+    def __init__(self, cache=SEARCH_CACHE, catalog=CATALOG):
+        self.cache = cache
+        self.catalog = catalog
+        self.page_size = 0
+        # Latest query per (session, box); bounded because sessions come and go for the life of the process
+        self._latest = TTLCache(ttl=3600, max_entries=4096)
+        self._lock = threading.Lock()
+
+    def request(self, query):
+        params = {
+            "section": "quotes",
+            "string": query,
+            "lang_ID": 1,
+        }
+        try:
+            response = client.get("search_by_type.php", params)
+        except Exception as exc:
+            raise SearchError(f"Request failed: {exc}") from exc
+        if response.status_code != 200:
+            raise SearchError(f"Request failed with status code {response.status_code}")
         try:
-            data = response.json()
-            suggestions = {
-                f"{item['search_main_longtext']} {item['search_main_subtext']}": {
-                    "pair_ID": item['pair_ID'],
-                    "search_main_longtext": item['search_main_longtext']
-                }
-                for item in data['data']['quotes']
-            }
-            st.session_state[f"suggestions_{key}"] = suggestions
-            return list(suggestions.keys())
-        except json.JSONDecodeError:
-            return ["Failed to decode JSON"]
-    else:
-        return [f"Request failed with status code {response.status_code}"]
\ No newline at end of file
+            quotes = response.json()['data']['quotes']
+        except (json.JSONDecodeError, KeyError, TypeError):
+            raise SearchError("Failed to decode JSON")
+        with self._lock:
+            self.page_size = max(self.page_size, len(quotes))
+        self.catalog.add(quotes)
+        return quotes
+
+    def from_prefix(self, query):
+        """Filter the complete results of the longest cached prefix, None if there are none"""
+        for end in range(len(query) - 1, 0, -1):
+            quotes = self.cache.get(query[:end])
+            if quotes is None:
+                continue
+            if len(quotes) >= self.page_size:
+                return None
+            matches = [
+                item for item in quotes
+                if any(query in str(item.get(field, '')).lower()
+                       for field in ('search_main_longtext', 'search_main_subtext', 'search_main_text'))
+            ]
+            return matches or None
+        return None
+
+    def from_catalog(self, query, matches):
+        """
+        Catalog matches when they are a complete answer, None otherwise.
+
+        The catalog only holds instruments seen so far, so a few substring hits say
+        nothing about what the API would return. It answers alone for an exact name,
+        symbol or description hit, or when it has at least a full API page of matches.
+        """
+        fields = ('search_main_longtext', 'search_main_subtext', 'search_main_text')
+        if any(str(item.get(field, '')).lower() == query for item in matches for field in fields):
+            return matches
+        if self.page_size and len(matches) >= self.page_size:
+            return matches[:self.page_size]
+        return None
+
+    def search(self, query, key):
+        """Return quotes for query, or None if a newer query from the same box superseded it; key identifies the box"""
+        query = query.strip().lower()
+        self._latest.set(key, query)
+
+        # An empty cached response falls through, so the catalog fallback still applies on repeats
+        quotes, fallback = self.cache.get(query) or None, []
+        if quotes is None and len(query) >= 3:
+            matches, fuzzy = self.catalog.search(query, limit=max(self.page_size, 20))
+            quotes, fallback = self.from_catalog(query, matches), matches + fuzzy
+        if quotes is None:
+            quotes = self.from_prefix(query)
+        if quotes is None:
+            try:
+                quotes = self.cache.get_or_compute(query, lambda: self.request(query)) or fallback
+            except SearchError:
+                if not fallback:
+                    raise
+                quotes = fallback
+
+        # Still cached for later refinements, but a stale answer must not replace newer suggestions
+        if self._latest.get(key) != query:
+            return None
+        return quotes
+
+SEARCH_SERVICE = SearchService()
+
+def fetch_search_results(query, key):
+    if not query or not query.strip():
+        return []
+    # Box keys repeat in every session, so supersession is tracked per session and box
+    ctx = get_script_run_ctx()
+    box = (ctx.session_id if ctx is not None else None, key)
+    try:
+        quotes = SEARCH_SERVICE.search(query, box)
+    except SearchError:
+        # Keep the current suggestions rather than showing an error as an option
+        quotes = None
+    if quotes is None:
+        return list(st.session_state.get(f"suggestions_{key}", {}).keys())
+
+    suggestions = {
+        f"{item['search_main_longtext']} {item['search_main_subtext']}": {
+            "pair_ID": item['pair_ID'],
+            "search_main_longtext": item['search_main_longtext']
+        }
+        for item in quotes
+    }
+    st.session_state[f"suggestions_{key}"] = suggestions
+    return list(suggestions.keys())
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from pypfopt.risk_models import CovarianceShrinkage
+from metrics import MEMORY_BUDGET
+
+# Projection defaults: 5 years of trading days, sampled monthly, reproducible seed
+HORIZON = 5 * 252
+SAMPLE_STEP = 21
+N_PATHS = 20000
+BLOCK_SIZE = 21
+SEED = 42
+PERCENTILES = [5, 25, 50, 75, 95]
+SHORTFALL_LEVELS = [0, -10, -25]
+# Paths are drawn in batches with their own seed, so results do not depend on the chunk size
+SEED_BATCH = 250
+
+def portfolio_returns(returns_df, weights):
+    """Daily returns of the daily-rebalanced portfolio (as the X-Ray portfolio line)"""
+    return returns_df.dropna().to_numpy(dtype=float) @ np.asarray(weights, dtype=float)
+
+def bootstrap_draws(history, n_paths, horizon, block, rng):
+    """Moving-block bootstrap: consecutive runs of `block` historical days, starts drawn uniformly"""
+    block = min(block, len(history))
+    n_blocks = -(-horizon // block)
+    starts = rng.integers(0, len(history) - block + 1, size=(n_paths, n_blocks))
+    rows = (starts[:, :, None] + np.arange(block)).reshape(n_paths, -1)[:, :horizon]
+    return history[rows]
+
+def simulate(returns_df, weights, method='bootstrap', horizon=HORIZON, n_paths=N_PATHS, seed=SEED,
+             block=BLOCK_SIZE, step=SAMPLE_STEP, memory_budget=MEMORY_BUDGET):
+    """
+    Simulated growth of 1 invested in the portfolio, one row per path.
+
+    method='bootstrap' resamples blocks of the portfolio's historical daily returns;
+    method='normal' draws Gaussian daily returns with the historical mean and the
+    Ledoit-Wolf covariance (for fixed weights the portfolio return is w'r, so only
+    its variance w'Sw is needed). Paths are generated in chunks sized to
+    memory_budget and only every `step` days (and the horizon) is kept. The same
+    seed gives the same paths whatever the budget.
+
+    Returns:
+        pd.DataFrame: (n_paths x samples) growth, columns are trading days ahead
+    """
+    history = portfolio_returns(returns_df, weights)
+    if method == 'normal':
+        weights = np.asarray(weights, dtype=float)
+        cov = CovarianceShrinkage(returns_df.dropna(), returns_data=True, frequency=1).ledoit_wolf().to_numpy()
+        mean, std = history.mean(), np.sqrt(weights @ cov @ weights)
+    elif method != 'bootstrap':
+        raise ValueError(f"Unknown simulation method: {method}")
+
+    samples = np.unique(np.append(np.arange(step, horizon + 1, step), horizon))
+    growth = np.empty((n_paths, len(samples)))
+    # Daily draws and their running product dominate memory: about 3 float64 per path-day
+    batches_per_chunk = max(1, memory_budget // (24 * horizon * SEED_BATCH))
+    seeds = np.random.SeedSequence(seed).spawn(-(-n_paths // SEED_BATCH))
+
+    for first in range(0, len(seeds), batches_per_chunk):
+        blocks = []
+        for b in range(first, min(first + batches_per_chunk, len(seeds))):
+            rng = np.random.default_rng(seeds[b])
+            size = min(SEED_BATCH, n_paths - b * SEED_BATCH)
+            if method == 'normal':
+                blocks.append(rng.normal(mean, std, size=(size, horizon)))
+            else:
+                blocks.append(bootstrap_draws(history, size, horizon, block, rng))
+        draws = np.vstack(blocks)
+        start = first * SEED_BATCH
+        growth[start:start + len(draws)] = np.cumprod(1 + draws, axis=1)[:, samples - 1]
+
+    return pd.DataFrame(growth, columns=samples)
+
+def fan_chart(growth, percentiles=PERCENTILES):
+    """Percentiles of the simulated value (%, 100 = amount invested) at each sampled day, starting at 100"""
+    values = np.percentile(growth.to_numpy(), percentiles, axis=0).T * 100
+    fan = pd.DataFrame(values, index=growth.columns, columns=[f"P{p}" for p in percentiles])
+    start = pd.DataFrame(100.0, index=[0], columns=fan.columns)
+    return pd.concat([start, fan]).rename_axis('Days')
+
+def shortfall_probabilities(growth, levels=SHORTFALL_LEVELS, years=None):
+    """Probability (%) of a return below each level (%) after each full year of the horizon"""
+    if years is None:
+        years = range(1, int(growth.columns[-1] // 252) + 1)
+    rows = {}
+    for year in years:
+        values = growth[growth.columns[growth.columns >= year * 252][0]].to_numpy()
+        rows[f"{year}y"] = [np.mean(values < 1 + level / 100) * 100 for level in levels]
+    return pd.DataFrame.from_dict(rows, orient='index', columns=[f"< {level}%" for level in levels])
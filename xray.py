@@ -1,5 +1,5 @@
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, HRFlowable, Flowable
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, HRFlowable, Flowable, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, mm
 from reportlab.pdfbase.ttfonts import TTFont
@@ -252,6 +252,101 @@ def create_fund_performance_chart(series1, series2=None):
     drawing.add(lp)
     return drawing
 
+# Function to create a line chart for rolling risk series (values already in display units)
+def create_rolling_chart(series1, series2=None, label_format="{:.0f}%"):
+    drawing = Drawing(500, 130)
+    lp = LinePlot()
+    lp.x = 25
+    lp.y = 20
+    lp.height = 105
+    lp.width = 513
+
+    lp.lines[0].strokeColor = colors.HexColor("#BA5C12")
+    if series2 is not None:
+        lp.lines[1].strokeColor = colors.HexColor("#24306290")
+
+    lp.data = convert_series_to_lineplot_data(series1, series2)
+    lp.joinedLines = 1
+    lp.strokeColor = colors.white
+    lp.lines.strokeWidth = 0
+
+    lp.xValueAxis.valueMin = min(series1.index).toordinal()
+    lp.xValueAxis.valueMax = max(series1.index).toordinal()
+    lp.xValueAxis.strokeColor = colors.darkgrey
+    lp.xValueAxis.gridStrokeColor = colors.darkgrey
+    lp.xValueAxis.visibleGrid = 1
+    lp.xValueAxis.labels.fontName = 'OpenSansLight'
+    lp.xValueAxis.labels.fontSize = 25/3
+    lp.xValueAxis.gridStrokeWidth = 0.5
+    lp.xValueAxis.gridStrokeDashArray = [2, 2]
+    lp.xValueAxis.strokeWidth = 0.5
+
+    years = range(series1.index.min().year + 1, series1.index.max().year + 1)
+    lp.xValueAxis.valueSteps = [pd.Timestamp(year=year, month=1, day=1).toordinal() for year in years]
+    lp.xValueAxis.labels.textAnchor = 'middle'
+    lp.xValueAxis.labelTextFormat = lambda x: str(pd.Timestamp.fromordinal(int(x)).year)
+
+    values = pd.concat([series1, series2]) if series2 is not None else series1
+    lp.yValueAxis.valueMin = values.min()
+    lp.yValueAxis.valueMax = values.max()
+    lp.yValueAxis.strokeColor = colors.white
+    lp.yValueAxis.gridStrokeColor = colors.darkgrey
+    lp.yValueAxis.visibleGrid = 1
+    lp.yValueAxis.visibleTicks = 0
+    lp.yValueAxis.labels.fontName = 'OpenSansLight'
+    lp.yValueAxis.labels.fontSize = 25/3
+    lp.yValueAxis.gridStrokeWidth = 0.5
+    lp.yValueAxis.labelTextFormat = lambda y: label_format.format(y)
+
+    drawing.add(lp)
+    return drawing
+
+# Function to create a fan chart of simulated percentiles (index: trading days ahead, values: % of amount invested)
+def create_fan_chart(fan):
+    drawing = Drawing(500, 200)
+    lp = LinePlot()
+    lp.x = 25
+    lp.y = 20
+    lp.height = 170
+    lp.width = 513
+
+    years = fan.index / 252
+    lp.data = [list(zip(years, fan[column])) for column in fan.columns]
+    # Outer percentiles light, median darkest
+    shades = ["#24306240", "#24306280", "#BA5C12", "#24306280", "#24306240"]
+    for i in range(len(fan.columns)):
+        lp.lines[i].strokeColor = colors.HexColor(shades[i % len(shades)])
+    lp.joinedLines = 1
+    lp.strokeColor = colors.white
+    lp.lines.strokeWidth = 1
+
+    lp.xValueAxis.valueMin = 0
+    lp.xValueAxis.valueMax = years.max()
+    lp.xValueAxis.valueSteps = list(range(0, int(years.max()) + 1))
+    lp.xValueAxis.strokeColor = colors.darkgrey
+    lp.xValueAxis.gridStrokeColor = colors.darkgrey
+    lp.xValueAxis.visibleGrid = 1
+    lp.xValueAxis.labels.fontName = 'OpenSansLight'
+    lp.xValueAxis.labels.fontSize = 25/3
+    lp.xValueAxis.gridStrokeWidth = 0.5
+    lp.xValueAxis.gridStrokeDashArray = [2, 2]
+    lp.xValueAxis.strokeWidth = 0.5
+    lp.xValueAxis.labelTextFormat = lambda x: f"{x:.0f}y"
+
+    lp.yValueAxis.valueMin = fan.values.min()
+    lp.yValueAxis.valueMax = fan.values.max()
+    lp.yValueAxis.strokeColor = colors.white
+    lp.yValueAxis.gridStrokeColor = colors.darkgrey
+    lp.yValueAxis.visibleGrid = 1
+    lp.yValueAxis.visibleTicks = 0
+    lp.yValueAxis.labels.fontName = 'OpenSansLight'
+    lp.yValueAxis.labels.fontSize = 25/3
+    lp.yValueAxis.gridStrokeWidth = 0.5
+    lp.yValueAxis.labelTextFormat = lambda y: f"{(y/100)*10:.0f}k"
+
+    drawing.add(lp)
+    return drawing
+
 def calculate_sri(historical_prices, sri_value=None):
     if sri_value is not None:
         return int(sri_value)
@@ -302,7 +397,7 @@ def create_sri(historical_prices, sri_value=None):
     return [[title], [line], [risk_label], [table], [Spacer(1, 2)]]
 
 # Set up the PDF document
-def create_pdf(combined_metrics_df, combined_portfolio, metrics_portfolio, investment_strategy, sri_value, combined_bench, additional_data, benchmark):
+def create_pdf(combined_metrics_df, combined_portfolio, metrics_portfolio, investment_strategy, sri_value, combined_bench, additional_data, benchmark, rolling_data=None, projection=None):
     output_path = "portfolio_report.pdf"
     doc = SimpleDocTemplate(output_path, pagesize=A4, topMargin=5, bottomMargin=5, leftMargin=5, rightMargin=5)
     elements = []
@@ -540,6 +635,41 @@ def create_pdf(combined_metrics_df, combined_portfolio, metrics_portfolio, inves
     ]))
     elements.append(main_table)
 
+    # Risk Analytics: rolling series on a second page, portfolio against benchmark
+    if rolling_data:
+        elements.append(PageBreak())
+        for section, (series1, series2, label_format) in rolling_data.items():
+            elements.append(Paragraph(section, section_style))
+            elements.append(HRFlowable(width="100%", thickness=1, lineCap='round', color=colors.HexColor("#24306280"), spaceBefore=0, spaceAfter=0))
+            elements.append(create_rolling_chart(series1, series2, label_format))
+            elements.append(Spacer(1, 6))
+        elements.append(Paragraph('Rolling statistics use a trailing one-year window of daily returns. Drawdown is measured from the running peak.', bottom_style))
+
+    # Projection: simulated percentiles of 10k invested and the probability of losses
+    if projection is not None:
+        fan, shortfall, description = projection
+        elements.append(PageBreak())
+        elements.append(Paragraph("Projected Value of 10k (Percentiles)", section_style))
+        elements.append(HRFlowable(width="100%", thickness=1, lineCap='round', color=colors.HexColor("#24306280"), spaceBefore=0, spaceAfter=0))
+        elements.append(create_fan_chart(fan))
+        elements.append(Paragraph(" / ".join(fan.columns) + " percentiles, median highlighted.", bottom_style))
+        elements.append(Spacer(1, 6))
+        elements.append(Paragraph("Probability of Loss (%)", section_style))
+        elements.append(HRFlowable(width="100%", thickness=1, lineCap='round', color=colors.HexColor("#24306280"), spaceBefore=0, spaceAfter=0))
+        shortfall_data = [["Horizon"] + list(shortfall.columns)] + [[index] + [f"{value:.1f}" for value in row] for index, row in zip(shortfall.index, shortfall.values)]
+        shortfall_table = Table(shortfall_data, colWidths=[60] + [60] * len(shortfall.columns))
+        shortfall_table.setStyle(TableStyle([
+            ('FONT', (0, 0), (-1, -1), 'OpenSansLight', 8),
+            ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.darkgrey),
+            ('LINEBELOW', (0, -1), (-1, -1), 0.5, colors.darkgrey),
+            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor("#24306280")),
+        ]))
+        elements.append(shortfall_table)
+        elements.append(Spacer(1, 6))
+        elements.append(Paragraph(description, bottom_style))
+        elements.append(Paragraph('Projections are hypothetical simulations based on past returns and do not guarantee future results; the value of investments can go down as well as up', bottom_style))
+
     # Footer
     def add_footer(canvas, doc):
         width, height = A4
@@ -566,7 +696,7 @@ def create_pdf(combined_metrics_df, combined_portfolio, metrics_portfolio, inves
 
         footer_paragraph.drawOn(canvas, x_position, y_position)
 
-    doc.build(elements, onFirstPage=add_footer)
+    doc.build(elements, onFirstPage=add_footer, onLaterPages=add_footer)
 
 if __name__ == "__main__":
     create_pdf()
\ No newline at end of file